@@ -0,0 +1,57 @@
+"""Сравнение прямого метода и Барнса-Хата на поясе астероидов.
+
+Запуск: python -m benchmarks.solvers [N ...]
+"""
+import sys
+import time
+
+import numpy as np
+from simulation.barnes_hut import QuadTree
+from simulation.physics import gravity_accelerations
+
+G = 0.8
+THETA = 0.7
+# Прямой метод дальше этого размера слишком долог для замеров
+DIRECT_LIMIT = 20000
+
+
+def asteroid_belt(n, seed=0):
+    rng = np.random.default_rng(seed)
+    radius = rng.uniform(200, 600, n)
+    angle = rng.uniform(0, 2 * np.pi, n)
+    positions = np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+    masses = rng.uniform(0.1, 1.0, n)
+    return positions, masses
+
+
+def best_time(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(sizes):
+    print(f"{'N':>8} {'direct, s':>12} {'tree, s':>12} {'speedup':>9} {'rel. err':>10}")
+    for n in sizes:
+        positions, masses = asteroid_belt(n)
+        tree_time, tree_acc = best_time(
+            lambda: QuadTree(positions, masses).accelerations(positions, G, THETA)
+        )
+        if n <= DIRECT_LIMIT:
+            direct_time, direct_acc = best_time(
+                lambda: gravity_accelerations(positions, positions, masses, G),
+                repeat=1 if n > 5000 else 3
+            )
+            error = np.linalg.norm(tree_acc - direct_acc, axis=1) / np.maximum(
+                np.linalg.norm(direct_acc, axis=1), 1e-12)
+            print(f"{n:>8} {direct_time:>12.4f} {tree_time:>12.4f} "
+                  f"{direct_time / tree_time:>9.1f} {np.median(error):>10.2e}")
+        else:
+            print(f"{n:>8} {'-':>12} {tree_time:>12.4f} {'-':>9} {'-':>10}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 500, 1000, 2000, 5000, 10000, 50000])
@@ -0,0 +1,295 @@
+"""Набор замеров производительности физики и отрисовки.
+
+Работает без окна (SDL dummy) с фиксированным зерном. Результаты
+печатаются и сохраняются в JSON; с --baseline сравниваются с прошлым
+прогоном, и при замедлении больше порога код возврата равен 1.
+
+Примеры:
+    python -m benchmarks.suite -o baseline.json
+    python -m benchmarks.suite --baseline baseline.json --threshold 0.15
+    python -m benchmarks.suite --filter grid
+    python -m benchmarks.suite --check      # каждый замер один раз, без времени
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+SEED = 12345
+# Каждый замер повторяется, пока не наберется MIN_TIME секунд или MAX_REPEATS раз
+MIN_TIME = 0.2
+MIN_REPEATS = 3
+MAX_REPEATS = 50
+
+CASES = []
+
+
+def case(name):
+    """Регистрирует замер: функция возвращает setup, а setup - замеряемое действие"""
+    def register(func):
+        CASES.append((name, func))
+        return func
+    return register
+
+
+def measure(setup):
+    action = setup()
+    action()  # прогрев кэшей
+    times = []
+    total = 0.0
+    while len(times) < MAX_REPEATS and (len(times) < MIN_REPEATS or total < MIN_TIME):
+        start = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        total += elapsed
+        if elapsed > MIN_TIME:
+            # Долгие замеры достаточно повторить один раз
+            break
+    return {'min': min(times), 'median': statistics.median(times), 'repeats': len(times)}
+
+
+def scene(n_dynamic, seed=SEED):
+    """Стандартная система create_bodies плюс n_dynamic обломков"""
+    from simulation.celestial import CelestialBody, create_bodies
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    bodies = list(create_bodies())
+    world = bodies[0].world
+    radius = rng.uniform(150, 600, n_dynamic)
+    angle = rng.uniform(0, 2 * np.pi, n_dynamic)
+    speed = np.sqrt(0.8 * 1000 / radius)
+    for r, a, v in zip(radius, angle, speed):
+        bodies.append(CelestialBody(
+            r * np.cos(a), r * np.sin(a), 0.01, 1, (120, 120, 120), "Обломок",
+            is_static=False, vx=-v * np.sin(a), vy=v * np.cos(a), world=world
+        ))
+    return bodies
+
+
+def screen_surface(width=1024, height=768):
+    return pygame.Surface((width, height))
+
+
+for _n in (4, 100, 1000, 10000):
+    @case(f'physics.update[N={_n}]')
+    def _update(n=_n):
+        def setup():
+            bodies = scene(max(0, n - 4))
+            station = bodies[3]
+            return lambda: station.update(bodies)
+        return setup
+
+
+for _n in (4, 100, 1000, 4000, 10000):
+    @case(f'physics.world_step[N={_n}]')
+    def _world_step(n=_n):
+        def setup():
+            world = scene(max(0, n - 4))[0].world
+            return lambda: world.step(trails=False)
+        return setup
+
+
+for _n in (10000,):
+    @case(f'physics.barnes_hut[N={_n}]')
+    def _barnes_hut(n=_n):
+        def setup():
+            from simulation.config import CONFIG as cfg
+            world = scene(n - 4)[0].world
+
+            def action():
+                solver = cfg['SOLVER']
+                cfg['SOLVER'] = 'barnes_hut'
+                try:
+                    world.step(trails=False)
+                finally:
+                    cfg['SOLVER'] = solver
+            return action
+        return setup
+
+
+for _size in ((800, 600), (1920, 1080), (3840, 2160)):
+    @case(f'grid.redraw[{_size[0]}x{_size[1]}]')
+    def _grid_redraw(size=_size):
+        def setup():
+            from simulation.graphics import draw_gravity_grid
+            bodies = scene(0)
+            surface = screen_surface(*size)
+            offset = [0.0]
+
+            def action():
+                # Каждый раз новая камера: слой сетки перерисовывается
+                offset[0] += 1.0
+                draw_gravity_grid(surface, bodies, offset[0], 0, 1.0)
+            return action
+        return setup
+
+    @case(f'grid.cached[{_size[0]}x{_size[1]}]')
+    def _grid_cached(size=_size):
+        def setup():
+            from simulation.graphics import draw_gravity_grid
+            bodies = scene(0)
+            surface = screen_surface(*size)
+            return lambda: draw_gravity_grid(surface, bodies, 0, 0, 1.0)
+        return setup
+
+
+@case('body.draw[trail=10000]')
+def _trail_draw():
+    def setup():
+        from simulation.physics import World
+        from simulation.celestial import CelestialBody
+        world = World(trail_length=10000)
+        CelestialBody(0, 0, 1000, 30, (30, 144, 255), "Земля", world=world)
+        station = CelestialBody(200, 0, 1, 4, (220, 220, 220), "Станция",
+                                is_static=False, vy=2.0, world=world)
+        world.advance(10000)
+        surface = screen_surface()
+        return lambda: station.draw(surface, 0, 0, 1.0)
+    return setup
+
+
+@case('particles.update[5000]')
+def _particles_update():
+    def setup():
+        from simulation.particles import ParticleSystem
+        particles = ParticleSystem(capacity=5000, seed=SEED)
+
+        def action():
+            particles.emit_thrust(0, 0, 1.0, count=500)
+            particles.update()
+        return action
+    return setup
+
+
+@case('particles.draw[5000]')
+def _particles_draw():
+    def setup():
+        from simulation.graphics import draw_particles
+        from simulation.particles import ParticleSystem
+        particles = ParticleSystem(capacity=5000, seed=SEED)
+        for i in range(10):
+            particles.emit_thrust(0, 0, i * 0.6, count=500)
+        surface = screen_surface()
+        return lambda: draw_particles(surface, particles, 0, 0, 1.0)
+    return setup
+
+
+for _grid in (False, True):
+    @case(f'ui.draw_ui[grid={"on" if _grid else "off"}]')
+    def _draw_ui(grid=_grid):
+        def setup():
+            from simulation.config import CONFIG as cfg
+            from simulation.particles import ParticleSystem
+            from simulation.ui import draw_ui
+            bodies = scene(0)
+            earth, station = bodies[0], bodies[3]
+            station.world.advance(300)
+            particles = ParticleSystem(seed=SEED)
+            particles.emit_thrust(station.x, station.y, 1.0, count=50)
+            surface = screen_surface()
+
+            def action():
+                surface.fill(cfg['BACKGROUND'])
+                draw_ui(surface, station, earth, 1.0, True, grid, True, 0, 0,
+                        surface.get_width(), surface.get_height(), bodies,
+                        particles, True, 1.0)
+            return action
+        return setup
+
+
+def check(name_filter=''):
+    """Выполняет каждый замер один раз; код 1, если какой-то упал"""
+    failed = 0
+    for name, make in CASES:
+        if name_filter not in name:
+            continue
+        try:
+            action = make()()
+            action()
+        except Exception as error:
+            failed += 1
+            print(f"ОШИБКА {name}: {type(error).__name__}: {error}")
+        else:
+            print(f"{name:<32} ok")
+    return 1 if failed else 0
+
+
+def compare(results, baseline, threshold):
+    """Список (имя, было, стало, отношение) для замедлившихся замеров"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        ratio = result['median'] / before['median']
+        if ratio > 1 + threshold:
+            regressions.append((name, before['median'], result['median'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности")
+    parser.add_argument('-o', '--output', help="сохранить результаты в JSON")
+    parser.add_argument('--baseline', help="JSON прошлого прогона для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="допустимое замедление медианы (доля)")
+    parser.add_argument('--filter', default='', help="только замеры, содержащие подстроку")
+    parser.add_argument('--check', action='store_true',
+                        help="только проверить, что каждый замер выполняется без ошибок")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    if args.check:
+        return check(args.filter)
+
+    results = {}
+    for name, make in CASES:
+        if args.filter not in name:
+            continue
+        results[name] = measure(make())
+        r = results[name]
+        print(f"{name:<32} median {r['median'] * 1000:>10.3f} ms   "
+              f"min {r['min'] * 1000:>10.3f} ms   x{r['repeats']}")
+
+    report = {
+        'meta': {
+            'seed': SEED,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pygame': pygame.version.ver,
+            'machine': platform.machine(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"РЕГРЕССИЯ {name}: {before * 1000:.3f} -> {after * 1000:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print("Регрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Блочные шаги против единого шага на близких пролетах.
+
+Пробные обломки (масса 0) на круговых орбитах вокруг Земли и несколько
+тел на вытянутых орбитах, задевающих Землю. Ошибка - отклонение
+пролетающих тел от эталона (yoshida4 с шагом dt / 64) к концу прогона.
+
+Запуск: python -m benchmarks.timesteps [N ...]
+"""
+import sys
+import time
+
+import numpy as np
+from simulation.config import CONFIG as cfg
+from simulation.physics import World
+
+STEPS = 500
+SKIMMERS = 4
+# Перицентр пролетающих тел; радиус Земли 30
+PERICENTER = 36.0
+
+
+def close_pass_scene(n_debris, seed=0):
+    """World: Земля, пролетающие тела (индексы 1..SKIMMERS), затем обломки"""
+    rng = np.random.default_rng(seed)
+    gm = cfg['G'] * cfg['EARTH_MASS']
+    world = World(capacity=1 + SKIMMERS + n_debris)
+    world.add(None, 0, 0, cfg['EARTH_MASS'], cfg['EARTH_RADIUS'])
+
+    # Из апоцентра по эллипсу с перицентром PERICENTER
+    apocenter = rng.uniform(300, 500, SKIMMERS)
+    angle = rng.uniform(0, 2 * np.pi, SKIMMERS)
+    semi_major = (apocenter + PERICENTER) / 2
+    speed = np.sqrt(gm * (2 / apocenter - 1 / semi_major))
+    pos = np.column_stack((apocenter * np.cos(angle), apocenter * np.sin(angle)))
+    vel = np.column_stack((-np.sin(angle), np.cos(angle))) * speed[:, np.newaxis]
+    world.add_many([None] * SKIMMERS, pos, vel, 1.0, 1.0, False)
+
+    radius = rng.uniform(150, 600, n_debris)
+    angle = rng.uniform(0, 2 * np.pi, n_debris)
+    speed = np.sqrt(gm / radius)
+    pos = np.column_stack((radius * np.cos(angle), radius * np.sin(angle)))
+    vel = np.column_stack((-np.sin(angle), np.cos(angle))) * speed[:, np.newaxis]
+    world.add_many([None] * n_debris, pos, vel, 0.0, 1.0, False)
+    return world
+
+
+def run(world, integrator, dt, steps):
+    """Время прогона и число вычисленных ускорений (тело-вычислений)"""
+    evaluations = 0
+    accelerations = world.accelerations
+
+    def counted(dynamic=None):
+        nonlocal evaluations
+        dynamic, acc = accelerations(dynamic)
+        evaluations += len(acc)
+        return dynamic, acc
+
+    world.accelerations = counted
+    start = time.perf_counter()
+    world.advance(steps, dt, trails=False, integrator=integrator)
+    elapsed = time.perf_counter() - start
+    del world.accelerations
+    return elapsed, evaluations
+
+
+def main(sizes):
+    collisions = cfg['COLLISIONS']
+    cfg['COLLISIONS'] = 'none'
+    try:
+        reference = close_pass_scene(0)
+        reference.advance(STEPS * 64, 1 / 64, trails=False, integrator='yoshida4')
+        expected = reference.pos[1:1 + SKIMMERS]
+
+        print(f"{'N':>6} {'method':>16} {'time, s':>9} {'evals':>10} {'max err':>10}")
+        for n in sizes:
+            for name, integrator, dt in (('leapfrog dt=1', 'leapfrog', 1.0),
+                                         ('leapfrog dt=1/16', 'leapfrog', 1 / 16),
+                                         ('block dt=1', 'block', 1.0)):
+                world = close_pass_scene(n)
+                elapsed, evaluations = run(world, integrator, dt, round(STEPS / dt))
+                error = np.hypot(*(world.pos[1:1 + SKIMMERS] - expected).T).max()
+                print(f"{n:>6} {name:>16} {elapsed:>9.3f} {evaluations:>10} {error:>10.2e}")
+    finally:
+        cfg['COLLISIONS'] = collisions
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 400])
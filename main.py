@@ -1,15 +1,59 @@
+import argparse
+import os
 import pygame
 import random
 import math
-from simulation.config import load_config
+from simulation.config import CONFIG as cfg
 from simulation.celestial import create_bodies, CelestialBody
+from simulation.checkpoint import save_checkpoint, load_checkpoint
 from simulation.graphics import world_to_screen
-from simulation.ui import draw_ui
+from simulation.heatmap import MODES as HEATMAP_MODES
+from simulation.particles import ParticleSystem
+from simulation.physics import TimeStepper
+from simulation.predictor import TrajectoryPredictor
+from simulation.profiler import FrameProfiler
+from simulation.recording import Recorder, Replay
+from simulation.scenario import create_scenario
+from simulation.stream import StreamServer
+from simulation.ui import draw_ui, draw_timeline, timeline_rect
+from simulation.worker import PhysicsWorker
 
-# Загрузка конфигурации
-cfg = load_config()
+def create_system(scenario=None):
+    """Тела новой системы: из файла сценария или случайные из create_bodies"""
+    if scenario:
+        return create_scenario(scenario)
+    return list(create_bodies())
+
+def find_bodies(bodies):
+    """Центральное тело (первое статичное или None) и станция (первое подвижное)"""
+    earth = next((body for body in bodies if body.is_static), None)
+    station = next(body for body in bodies if not body.is_static)
+    return earth, station
+
+def apply_impulse(station, worker, direction):
+    """Импульс станции; в режиме --threaded - командой потоку физики"""
+    if worker is None:
+        return station.apply_impulse(direction)
+    worker.impulse(direction)
+    return direction + math.pi
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Гравитационная модель")
+    parser.add_argument('--record', metavar='FILE', help="записывать траектории в файл (до первого слияния "
+                         "или разрушения тел)")
+    parser.add_argument('--replay', metavar='FILE', help="воспроизвести запись")
+    parser.add_argument('--load', metavar='FILE', help="начать со снимка состояния")
+    parser.add_argument('--scenario', metavar='FILE', help="система из файла сценария")
+    parser.add_argument('--checkpoint', metavar='FILE', default='quicksave.npz',
+                        help="файл снимка для F5/F9")
+    parser.add_argument('--profile-csv', metavar='FILE',
+                        help="записывать время фаз каждого кадра в CSV")
+    parser.add_argument('--threaded', action='store_true',
+                        help="считать физику в отдельном потоке")
+    parser.add_argument('--serve', action='store_true',
+                        help="транслировать состояние по TCP ([STREAM] в config.ini)")
+    args = parser.parse_args(argv)
 
-def main():
     pygame.init()
     pygame.display.set_caption("Гравитационная модель с импульсами корабля")
     
@@ -18,13 +62,19 @@ def main():
     clock = pygame.time.Clock()
     
     # Создание небесных тел
-    earth, moon, asteroid, station = create_bodies()
-    bodies = [earth, moon, asteroid, station]
+    replay = None
+    replay_step = 0
+    if args.replay:
+        replay = Replay(args.replay)
+        bodies = replay.create_bodies()
+    else:
+        bodies = create_system(args.scenario)
+    earth, station = find_bodies(bodies)
     
     # Переменные состояния
     max_speed = 0
     min_speed = float('inf')
-    thrust_particles = []
+    thrust_particles = ParticleSystem()
     thrust_direction = 0
     thrust_active = False
     thrust_counter = 0
@@ -36,13 +86,61 @@ def main():
     show_info = True
     show_vectors = False
     show_grid = True
+    show_prediction = False
+    # Режим тепловой карты поля или None
+    heatmap = cfg['HEATMAP'] if cfg['HEATMAP'] in HEATMAP_MODES else None
     fullscreen = False
     screen_width, screen_height = cfg['SCREEN_SIZE']
     running = True
     paused = True
+    # При воспроизведении физика не считается, и бюджет времени на нее не нужен
+    stepper = TimeStepper(budget=math.inf if replay is not None else None)
+    frame_seconds = 1 / 60
+    scrubbing = False
+    pending_load = args.load
+    pending_reset = False
+    profiler = FrameProfiler(csv_path=args.profile_csv)
+    predictor = TrajectoryPredictor()
+    if args.record and replay is None:
+        station.world.recorder = Recorder(args.record, station.world, stepper.dt)
+    worker = None
+    if args.threaded and replay is None:
+        worker = PhysicsWorker(bodies, stepper)
+        worker.start()
+    server = None
+    if args.serve:
+        server = StreamServer()
+        server.start()
     
     while running:
+        profiler.begin_frame()
         current_width, current_height = screen.get_size()
+        if worker is not None:
+            # Кадр рисуется по последнему снимку потока физики
+            snapshot = worker.acquire()
+            bodies, earth, station = snapshot.bodies, snapshot.earth, snapshot.station
+        
+        # Восстановление снимка (F9 или --load)
+        if pending_load:
+            loaded, particles, state = load_checkpoint(pending_load)
+            if worker is not None:
+                worker.reset(loaded, state['accumulator'])
+                worker.call(setattr, stepper, 'warp_index', state['warp_index'])
+            else:
+                if station.world.recorder is not None:
+                    station.world.recorder.close()
+                bodies = loaded
+                earth, station = find_bodies(bodies)
+                stepper.accumulator = state['accumulator']
+                stepper.warp_index = state['warp_index']
+            if particles is not None:
+                thrust_particles = particles
+            camera_x, camera_y, scale = state['camera_x'], state['camera_y'], state['scale']
+            thrust_active = state['thrust_active']
+            thrust_direction = state['thrust_direction']
+            thrust_counter = state['thrust_counter']
+            max_speed, min_speed = state['max_speed'], state['min_speed']
+            pending_load = None
         
         # Обработка событий
         for event in pygame.event.get():
@@ -57,29 +155,68 @@ def main():
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
                     paused = not paused
+                    if worker is not None:
+                        worker.pause(paused)
+                elif event.key == pygame.K_r and replay is not None:
+                    replay_step = 0
                 elif event.key == pygame.K_r:
-                    earth, moon, asteroid, station = create_bodies()
-                    bodies = [earth, moon, asteroid, station]
-                    max_speed = 0
-                    min_speed = float('inf')
-                    thrust_active = False
-                    thrust_particles = []
-                    camera_x, camera_y = 0, 0
-                    scale = 1.0
+                    pending_reset = True
+                elif event.key == pygame.K_F5 and replay is None:
+                    state = {
+                        'camera_x': camera_x, 'camera_y': camera_y, 'scale': scale,
+                        'thrust_active': thrust_active,
+                        'thrust_direction': thrust_direction,
+                        'thrust_counter': thrust_counter,
+                        'max_speed': max_speed, 'min_speed': min_speed,
+                        'accumulator': stepper.accumulator,
+                        'warp_index': stepper.warp_index,
+                    }
+                    if worker is not None:
+                        # station.world здесь - снимок для отрисовки, без памяти интегратора
+                        worker.save(args.checkpoint, thrust_particles, state)
+                    else:
+                        save_checkpoint(args.checkpoint, station.world, thrust_particles, state)
+                elif event.key == pygame.K_F9 and replay is None and os.path.exists(args.checkpoint):
+                    pending_load = args.checkpoint
+                elif event.key == pygame.K_c and worker is not None:
+                    worker.clear_trail()
                 elif event.key == pygame.K_c:
-                    station.trail = []
+                    station.clear_trail()
                 elif event.key == pygame.K_v:
                     show_vectors = not show_vectors
-                elif event.key == pygame.K_f:
+                elif replay is not None and event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    shift = 100 if event.mod & pygame.KMOD_SHIFT else 1
+                    direction = 1 if event.key == pygame.K_RIGHT else -1
+                    replay_step = max(0, min(len(replay) - 1, replay_step + direction * shift))
+                elif replay is not None and event.key == pygame.K_HOME:
+                    replay_step = 0
+                elif replay is not None and event.key == pygame.K_END:
+                    replay_step = len(replay) - 1
+                elif event.key == pygame.K_f and replay is None:
                     direction = random.uniform(0, 2 * math.pi)
-                    thrust_direction = station.apply_impulse(direction)
+                    thrust_direction = apply_impulse(station, worker, direction)
                     thrust_active = True
                     thrust_counter = 10
                 elif event.key == pygame.K_g:
                     show_grid = not show_grid
+                elif event.key == pygame.K_h:
+                    modes = (None,) + HEATMAP_MODES
+                    heatmap = modes[(modes.index(heatmap) + 1) % len(modes)]
+                elif event.key == pygame.K_RIGHTBRACKET and worker is not None:
+                    worker.call(stepper.faster)
+                elif event.key == pygame.K_LEFTBRACKET and worker is not None:
+                    worker.call(stepper.slower)
+                elif event.key == pygame.K_RIGHTBRACKET:
+                    stepper.faster()
+                elif event.key == pygame.K_LEFTBRACKET:
+                    stepper.slower()
                 elif event.key == pygame.K_0:
                     camera_x, camera_y = 0, 0
                     scale = 1.0
+                elif event.key == pygame.K_p:
+                    profiler.toggle()
+                elif event.key == pygame.K_t and replay is None:
+                    show_prediction = not show_prediction
                 elif event.key == pygame.K_i:
                     show_info = not show_info
                 elif event.key == pygame.K_F11:
@@ -91,7 +228,13 @@ def main():
                         screen = pygame.display.set_mode((screen_width, screen_height), pygame.RESIZABLE)
             
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:
+                if event.button == 1 and replay is not None:
+                    bar = timeline_rect(current_width, current_height)
+                    if bar.inflate(0, 10).collidepoint(event.pos):
+                        scrubbing = True
+                        replay_step = round((event.pos[0] - bar.x) / bar.width * (len(replay) - 1))
+                        replay_step = max(0, min(len(replay) - 1, replay_step))
+                elif event.button == 1:
                     mouse_x, mouse_y = event.pos
                     station_screen_x, station_screen_y = world_to_screen(
                         station.x, station.y, camera_x, camera_y, scale, 
@@ -100,7 +243,7 @@ def main():
                     dx = mouse_x - station_screen_x
                     dy = mouse_y - station_screen_y
                     direction = math.atan2(dy, dx)
-                    thrust_direction = station.apply_impulse(direction)
+                    thrust_direction = apply_impulse(station, worker, direction)
                     thrust_active = True
                     thrust_counter = 10
                 elif event.button == 3:
@@ -118,8 +261,14 @@ def main():
             elif event.type == pygame.MOUSEBUTTONUP:
                 if event.button == 3:
                     camera_dragging = False
+                elif event.button == 1:
+                    scrubbing = False
             
             elif event.type == pygame.MOUSEMOTION:
+                if scrubbing:
+                    bar = timeline_rect(current_width, current_height)
+                    replay_step = round((event.pos[0] - bar.x) / bar.width * (len(replay) - 1))
+                    replay_step = max(0, min(len(replay) - 1, replay_step))
                 if camera_dragging:
                     dx = event.pos[0] - camera_drag_start[0]
                     dy = event.pos[1] - camera_drag_start[1]
@@ -127,56 +276,119 @@ def main():
                     camera_y -= dy / scale
                     camera_drag_start = event.pos
         
+        profiler.mark('events')
+        
         # Обновление частиц двигателя
         if thrust_active:
             thrust_counter -= 1
             if thrust_counter <= 0:
                 thrust_active = False
-                thrust_particles = []
+                thrust_particles.clear()
             
-            for _ in range(5):
-                angle_offset = random.uniform(-0.3, 0.3)
-                dist = cfg['STATION_RADIUS'] + random.randint(0, 5)
-                px = station.x - dist * math.cos(thrust_direction + angle_offset)
-                py = station.y - dist * math.sin(thrust_direction + angle_offset)
-                speed = random.uniform(1.0, 3.0)
-                vx = speed * math.cos(thrust_direction + angle_offset)
-                vy = speed * math.sin(thrust_direction + angle_offset)
-                
-                thrust_particles.append({
-                    'x': px, 'y': py, 'vx': vx, 'vy': vy,
-                    'size': random.randint(2, 5), 'life': random.randint(10, 20)
-                })
+            thrust_particles.emit_thrust(station.x, station.y, thrust_direction)
         
-        for p in thrust_particles[:]:
-            p['x'] += p['vx']
-            p['y'] += p['vy']
-            p['life'] -= 1
-            if p['life'] <= 0:
-                thrust_particles.remove(p)
+        thrust_particles.update()
+        profiler.mark('particles')
         
         # Обновление физики
-        if not paused:
-            station.update(bodies)
-            current_speed = math.sqrt(station.vx**2 + station.vy**2)
-            if current_speed > max_speed:
-                max_speed = current_speed
-            if current_speed < min_speed:
-                min_speed = current_speed
+        if replay is not None:
+            # Воспроизведение: физика не считается, шаг берется из файла
+            if not paused and not scrubbing:
+                replay_step = min(replay_step + stepper.take_steps(frame_seconds), len(replay) - 1)
+            replay.apply(station.world, replay_step)
+        elif not paused:
+            if worker is None:
+                stepper.advance(station.world, frame_seconds)
+                if len(bodies) != station.world.count:
+                    # Часть тел слилась или разрушилась при столкновениях
+                    bodies = [body for body in bodies if body.alive]
+                station_lost = not station.alive
+            else:
+                # Шаги считает поток физики, здесь только его снимок
+                station_lost = worker.station_lost
+            if not station_lost:
+                current_speed = math.sqrt(station.vx**2 + station.vy**2)
+                if current_speed > max_speed:
+                    max_speed = current_speed
+                if current_speed < min_speed:
+                    min_speed = current_speed
+            else:
+                # Станция разрушилась или слилась с другим телом
+                pending_reset = True
+        
+        # Новая система (R или гибель станции)
+        if pending_reset:
+            if worker is not None:
+                # Систему заменит поток физики; он же закроет прежнюю запись
+                worker.reset(create_system(args.scenario))
+            else:
+                # Запись относится к прежней системе и на этом завершается
+                if station.world.recorder is not None:
+                    station.world.recorder.close()
+                    station.world.recorder = None
+                bodies = create_system(args.scenario)
+                earth, station = find_bodies(bodies)
+                stepper.reset()
+            max_speed = 0
+            min_speed = float('inf')
+            thrust_active = False
+            thrust_particles.clear()
+            camera_x, camera_y = 0, 0
+            scale = 1.0
+            pending_reset = False
+        
+        # Трансляция состояния и импульсы от наблюдателей
+        if server is not None:
+            for direction in server.commands():
+                if replay is None:
+                    thrust_direction = apply_impulse(station, worker, direction)
+                    thrust_active = True
+                    thrust_counter = 10
+            server.publish(station.world, replay_step if replay is not None else None)
+        
+        # Прогноз траектории и путь после импульса к курсору (считаются в фоне)
+        prediction = ghost = None
+        if show_prediction and replay is None:
+            prediction = predictor.predict(station.world, station)
+            if pygame.mouse.get_focused():
+                mouse_x, mouse_y = pygame.mouse.get_pos()
+                station_screen_x, station_screen_y = world_to_screen(
+                    station.x, station.y, camera_x, camera_y, scale,
+                    current_width, current_height
+                )
+                direction = math.atan2(mouse_y - station_screen_y, mouse_x - station_screen_x)
+                ghost = predictor.ghost(station.world, station, direction)
+        
+        profiler.mark('physics')
         
         # Отрисовка
         screen.fill(cfg['BACKGROUND'])
         
-        # Отрисовка UI
-        draw_ui(
-            screen, station, earth, scale, show_vectors, show_grid, show_info,
-            camera_x, camera_y, current_width, current_height, bodies,
-            thrust_particles, thrust_active, thrust_direction
-        )
+        # Отрисовка UI с интерполяцией между шагами физики
+        alpha = stepper.alpha if worker is None else snapshot.alpha
+        with station.world.interpolated(1.0 if paused or replay else alpha):
+            draw_ui(
+                screen, station, earth, scale, show_vectors, show_grid, show_info,
+                camera_x, camera_y, current_width, current_height, bodies,
+                thrust_particles, thrust_active, thrust_direction, stepper.warp,
+                profiler, prediction, ghost, heatmap
+            )
+        if replay is not None:
+            draw_timeline(screen, replay_step, len(replay))
         
         pygame.display.flip()
-        clock.tick(60)
+        profiler.mark('flip')
+        profiler.end_frame()
+        frame_seconds = clock.tick(60) / 1000
     
+    if worker is not None:
+        worker.stop()
+    predictor.stop()
+    if server is not None:
+        server.stop()
+    if station.world.recorder is not None:
+        station.world.recorder.close()
+    profiler.close()
     pygame.quit()
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+import numpy as np
+
+# Глубина дерева: координаты квантуются в 2**MAX_DEPTH ячеек по каждой оси
+MAX_DEPTH = 16
+# Число соседних целей, обходящих дерево одной группой
+GROUP_SIZE = 16
+# Максимальное число пар цель-узел в одном блоке вычислений
+PAIR_BLOCK = 1 << 20
+
+
+def _spread_bits(v):
+    v = v.astype(np.uint64)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x33333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x55555555)
+    return v
+
+
+def _morton_codes(positions):
+    lo = positions.min(axis=0)
+    extent = max(float((positions.max(axis=0) - lo).max()), 1e-9) * (1 + 1e-9)
+    cells = 1 << MAX_DEPTH
+    q = np.minimum(((positions - lo) / extent * cells).astype(np.int64), cells - 1)
+    return _spread_bits(q[:, 0]) | (_spread_bits(q[:, 1]) << np.uint64(1)), extent
+
+
+class QuadTree:
+    """Линейное квадродерево, построенное по кодам Мортона.
+
+    Узлы каждого уровня - непрерывные отрезки отсортированных кодов,
+    поэтому потомки узла тоже лежат подряд в массивах следующего уровня.
+    """
+
+    def __init__(self, positions, masses):
+        positions = np.asarray(positions, dtype=np.float64)
+        masses = np.asarray(masses, dtype=np.float64)
+        keep = masses > 0
+        positions = positions[keep]
+        masses = masses[keep]
+
+        if len(masses) == 0:
+            self.mass = np.zeros(0)
+            self.com = np.zeros((0, 2))
+            self.size = np.zeros(0)
+            self.count = np.zeros(0, dtype=np.int64)
+            self.child_start = np.zeros(0, dtype=np.int64)
+            self.child_count = np.zeros(0, dtype=np.int64)
+            return
+
+        codes, extent = _morton_codes(positions)
+
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        masses = masses[order]
+        weighted = positions[order] * masses[:, np.newaxis]
+        n = len(codes)
+
+        levels = []
+        for level in range(MAX_DEPTH + 1):
+            prefix = codes >> np.uint64(2 * (MAX_DEPTH - level))
+            starts = np.concatenate(([0], np.flatnonzero(prefix[1:] != prefix[:-1]) + 1))
+            levels.append(starts)
+
+        mass, com, size, count, child_start, child_count = [], [], [], [], [], []
+        offset = 0
+        for level, starts in enumerate(levels):
+            ends = np.append(starts[1:], n)
+            m = np.add.reduceat(masses, starts)
+            mass.append(m)
+            com.append(np.add.reduceat(weighted, starts, axis=0) / m[:, np.newaxis])
+            size.append(np.full(len(starts), extent / (1 << level)))
+            count.append(ends - starts)
+
+            next_offset = offset + len(starts)
+            if level < MAX_DEPTH:
+                nxt = levels[level + 1]
+                first = np.searchsorted(nxt, starts)
+                last = np.searchsorted(nxt, ends)
+                child_start.append(first + next_offset)
+                child_count.append(last - first)
+            else:
+                child_start.append(np.zeros(len(starts), dtype=np.int64))
+                child_count.append(np.zeros(len(starts), dtype=np.int64))
+            offset = next_offset
+
+        self.mass = np.concatenate(mass)
+        self.com = np.concatenate(com)
+        self.size = np.concatenate(size)
+        self.count = np.concatenate(count)
+        self.child_start = np.concatenate(child_start)
+        self.child_count = np.concatenate(child_count)
+
+    def accelerations(self, targets, g, theta):
+        """Ускорения точек targets (K, 2) по критерию открытия size / r < theta.
+
+        Цели сортируются по коду Мортона и обходят дерево группами по
+        GROUP_SIZE соседних точек, что сокращает обход в десятки раз.
+        """
+        targets = np.asarray(targets, dtype=np.float64)
+        acc = np.zeros_like(targets)
+        if len(self.mass) == 0 or len(targets) == 0:
+            return acc
+
+        order = np.argsort(_morton_codes(targets)[0], kind='stable')
+        ordered = targets[order]
+        starts = np.arange(0, len(ordered), GROUP_SIZE)
+        lo = np.minimum.reduceat(ordered, starts, axis=0)
+        hi = np.maximum.reduceat(ordered, starts, axis=0)
+        center = (lo + hi) / 2
+        reach = np.hypot(*(hi - lo).T) / 2
+
+        groups, nodes = self._walk(center, reach, theta)
+        acc[order] = self._interact(ordered, groups, nodes) * g
+        return acc
+
+    def _walk(self, center, reach, theta):
+        """Списки взаимодействий (группа, узел) для всех групп сразу"""
+        pair_group = np.arange(len(center))
+        pair_node = np.zeros(len(center), dtype=np.int64)
+        out_groups, out_nodes = [], []
+
+        while len(pair_node):
+            dx = self.com[pair_node, 0] - center[pair_group, 0]
+            dy = self.com[pair_node, 1] - center[pair_group, 1]
+            # Расстояние до ближайшей точки группы (консервативно)
+            gap = np.sqrt(dx * dx + dy * dy) - reach[pair_group]
+            opened = (self.count[pair_node] > 1) & (self.child_count[pair_node] > 0) \
+                & (self.size[pair_node] > theta * np.maximum(gap, 0.0))
+            accept = ~opened
+            out_groups.append(pair_group[accept])
+            out_nodes.append(pair_node[accept])
+
+            parents = pair_node[opened]
+            counts = self.child_count[parents]
+            total = int(counts.sum())
+            if total == 0:
+                break
+            base = np.repeat(self.child_start[parents], counts)
+            local = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair_node = base + local
+            pair_group = np.repeat(pair_group[opened], counts)
+
+        return np.concatenate(out_groups), np.concatenate(out_nodes)
+
+    def _interact(self, targets, groups, nodes):
+        k = len(targets)
+        n_groups = -(-k // GROUP_SIZE)
+        # Цели раскладываются в таблицу (группа, номер в группе)
+        padded = np.zeros((n_groups * GROUP_SIZE, 2))
+        padded[:k] = targets
+        tx = padded[:, 0].reshape(n_groups, GROUP_SIZE)
+        ty = padded[:, 1].reshape(n_groups, GROUP_SIZE)
+        ax = np.zeros((n_groups, GROUP_SIZE))
+        ay = np.zeros((n_groups, GROUP_SIZE))
+
+        order = np.argsort(groups, kind='stable')
+        groups = groups[order]
+        nodes = nodes[order]
+        block = max(1, PAIR_BLOCK // GROUP_SIZE)
+        for start in range(0, len(nodes), block):
+            group = groups[start:start + block]
+            node = nodes[start:start + block]
+
+            dx = self.com[node, 0, np.newaxis] - tx[group]
+            dy = self.com[node, 1, np.newaxis] - ty[group]
+            # Ограничение расстояния снизу, как в прямом методе
+            r2 = dx * dx
+            r2 += dy * dy
+            np.maximum(r2, 1.0, out=r2)
+            w = np.sqrt(r2)
+            w *= r2
+            np.divide(self.mass[node, np.newaxis], w, out=w)
+            dx *= w
+            dy *= w
+
+            bounds = np.concatenate(([0], np.flatnonzero(group[1:] != group[:-1]) + 1))
+            owners = group[bounds]
+            ax[owners] += np.add.reduceat(dx, bounds, axis=0)
+            ay[owners] += np.add.reduceat(dy, bounds, axis=0)
+
+        return np.column_stack((ax.ravel()[:k], ay.ravel()[:k]))
@@ -1,92 +1,217 @@
 import pygame
 import math
 import random
+import numpy as np
 from simulation.config import CONFIG as cfg
-from simulation.graphics import world_to_screen
+from simulation.graphics import world_to_screen_array, decimate_polyline, clip_polyline, draw_points
+from simulation.physics import World, gravity_accelerations
+from simulation.text import render_text
+
+# Уровни детализации по экранному радиусу тела в пикселях
+HIGHLIGHT_RADIUS = 4  # блик рисуется у тел крупнее этого
+LABEL_RADIUS = 2      # подписи статичных тел - начиная с этого радиуса
+# Запас отсечения для подписи под статичным телом, пикселей
+LABEL_MARGIN = 40
+# Следы тел-точек рисуются только у первых стольких из них (по индексу)
+POINT_TRAIL_LIMIT = 256
 
 class CelestialBody:
-    def __init__(self, x, y, mass, radius, color, name, is_static=True, vx=0, vy=0):
-        self.x = x
-        self.y = y
-        self.mass = mass
-        self.radius = radius
-        self.color = color
+    def __init__(self, x, y, mass, radius, color, name, is_static=True, vx=0, vy=0,
+                 world=None):
+        self.world = world if world is not None else World()
+        self.index = self.world.add(self, x, y, mass, radius, is_static, vx, vy, color)
         self.name = name
-        self.is_static = is_static
-        self.vx = vx
-        self.vy = vy
-        self.trail = []
-        
+
+    @classmethod
+    def many(cls, world, pos, vel, mass, radius, color, name, is_static=False):
+        """Группа однотипных тел, добавленных в world одной операцией"""
+        bodies = [cls.__new__(cls) for _ in range(len(pos))]
+        indices = world.add_many(bodies, pos, vel, mass, radius, is_static, color)
+        for body, index in zip(bodies, indices.tolist()):
+            body.world = world
+            body.index = index
+            body.name = name
+        return bodies
+
+    @property
+    def alive(self):
+        """False после удаления тела из World (слияние или уничтожение)"""
+        return self.index is not None
+
+    # Свойства - представления данных из массивов World
+    @property
+    def x(self):
+        return float(self.world.pos[self.index, 0])
+
+    @x.setter
+    def x(self, value):
+        self.world.pos[self.index, 0] = value
+
+    @property
+    def y(self):
+        return float(self.world.pos[self.index, 1])
+
+    @y.setter
+    def y(self, value):
+        self.world.pos[self.index, 1] = value
+
+    @property
+    def vx(self):
+        return float(self.world.vel[self.index, 0])
+
+    @vx.setter
+    def vx(self, value):
+        self.world.vel[self.index, 0] = value
+
+    @property
+    def vy(self):
+        return float(self.world.vel[self.index, 1])
+
+    @vy.setter
+    def vy(self, value):
+        self.world.vel[self.index, 1] = value
+
+    @property
+    def mass(self):
+        return float(self.world.mass[self.index])
+
+    @mass.setter
+    def mass(self, value):
+        self.world.mass[self.index] = value
+
+    @property
+    def radius(self):
+        return float(self.world.radius[self.index])
+
+    @radius.setter
+    def radius(self, value):
+        self.world.radius[self.index] = value
+
+    @property
+    def is_static(self):
+        return bool(self.world.static[self.index])
+
+    @is_static.setter
+    def is_static(self, value):
+        self.world.static[self.index] = value
+
+    @property
+    def color(self):
+        return tuple(self.world.color[self.index].tolist())
+
+    @color.setter
+    def color(self, value):
+        self.world.color[self.index] = value
+
     def update(self, bodies):
         if self.is_static:
             return
-            
-        total_ax = 0
-        total_ay = 0
-        
-        for body in bodies:
-            if body is self:
-                continue
-                
-            dx = body.x - self.x
-            dy = body.y - self.y
-            distance = max(math.sqrt(dx**2 + dy**2), 1)
-            
-            force = cfg['G'] * body.mass / (distance**2)
-            
-            total_ax += force * dx / distance
-            total_ay += force * dy / distance
-        
-        self.vx += total_ax
-        self.vy += total_ay
+
+        sources = np.array([(body.x, body.y) for body in bodies if body is not self])
+        masses = np.array([body.mass for body in bodies if body is not self])
+        ax, ay = gravity_accelerations(
+            np.array([(self.x, self.y)]), sources.reshape(-1, 2), masses, cfg['G']
+        )[0]
+
+        self.vx += ax
+        self.vy += ay
         self.x += self.vx
         self.y += self.vy
-        
-        self.trail.append((self.x, self.y))
-        if len(self.trail) > 300:
-            self.trail.pop(0)
+
+        self.record_trail()
+
+    def record_trail(self):
+        self.world.record_trails([self.index])
+
+    @property
+    def trail(self):
+        return self.world.trail_points(self.index)
+
+    def clear_trail(self):
+        self.world.trail_count[self.index] = 0
             
     def apply_impulse(self, direction):
         self.vx += cfg['IMPULSE_POWER'] * math.cos(direction)
         self.vy += cfg['IMPULSE_POWER'] * math.sin(direction)
+        self.world.impulses += 1
         return direction + math.pi
     
     def draw(self, surface, camera_x=0, camera_y=0, scale=1.0):
-        # Преобразование координат с учетом камеры и масштаба
-        screen_x, screen_y = world_to_screen(
-            self.x, self.y, camera_x, camera_y, scale, 
-            surface.get_width(), surface.get_height()
-        )
-        
+        draw_bodies(surface, [self], camera_x, camera_y, scale)
+
+def draw_bodies(surface, bodies, camera_x=0, camera_y=0, scale=1.0):
+    """Рисует тела одного World с отсечением по экрану и уровнями детализации.
+
+    Невидимые тела отбрасываются в мировых координатах до любой работы с
+    отдельным телом. Тела радиусом в пиксель записываются точками прямо в
+    пиксели поверхности одной операцией; блики и подписи рисуются только
+    у достаточно крупных тел, следы обрезаются по краям экрана.
+    """
+    if not bodies:
+        return
+    world = bodies[0].world
+    if len(bodies) == world.count:
+        # Все тела мира: срезы массивов вместо выборки по индексам
+        index = np.arange(world.count)
+        select = slice(0, world.count)
+    else:
+        index = np.array([body.index for body in bodies])
+        select = index
+    width, height = surface.get_size()
+
+    pos = world.pos[select]
+    radius = world.radius[select]
+    static = world.static[select]
+
+    # Видимая область в мировых координатах
+    left = camera_x - width / (2 * scale)
+    right = camera_x + width / (2 * scale)
+    top = camera_y - height / (2 * scale)
+    bottom = camera_y + height / (2 * scale)
+    reach = radius + np.where(static, LABEL_MARGIN / scale, 0.0)
+    x, y = pos[:, 0], pos[:, 1]
+    visible = (x + reach > left) & (x - reach < right) & (y + reach > top) & (y - reach < bottom)
+
+    has_trail = ~static & (world.trail_count[select] > 1)
+    candidates = np.flatnonzero(has_trail)
+    low = world.trail_min[select][candidates]
+    high = world.trail_max[select][candidates]
+    has_trail[candidates] = ((high[:, 0] >= left) & (low[:, 0] <= right) &
+                             (high[:, 1] >= top) & (low[:, 1] <= bottom))
+
+    screen = world_to_screen_array(pos, camera_x, camera_y, scale, width, height).astype(int)
+    scaled_radius = np.maximum(1, (radius * scale).astype(int))
+    point = visible & (scaled_radius == 1)
+    has_trail[np.flatnonzero(has_trail & (scaled_radius == 1))[POINT_TRAIL_LIMIT:]] = False
+
+    for k in np.flatnonzero((visible & ~point) | has_trail).tolist():
+        i = index[k]
         # Рисование следа орбиты с антиалиасингом
-        if len(self.trail) > 1 and not self.is_static:
-            trail_points = []
-            for tx, ty in self.trail:
-                trail_x, trail_y = world_to_screen(
-                    tx, ty, camera_x, camera_y, scale,
-                    surface.get_width(), surface.get_height()
-                )
-                trail_points.append((trail_x, trail_y))
-            
-            if len(trail_points) > 1:
-                pygame.draw.aalines(surface, cfg['TRAIL_COLOR'], False, trail_points)
-        
-        scaled_radius = max(1, int(self.radius * scale))
-        pygame.draw.circle(surface, self.color, (int(screen_x), int(screen_y)), scaled_radius)
-        
-        if scaled_radius > 4:
-            highlight = (
-                min(self.color[0]+40, 255), 
-                min(self.color[1]+40, 255), 
-                min(self.color[2]+40, 255)
-            )
-            pygame.draw.circle(surface, highlight, (int(screen_x), int(screen_y)), 
-                             max(1, int(scaled_radius * 0.5)))
-        
-        if self.is_static:
-            font = pygame.font.SysFont(None, 20)
-            text = font.render(self.name, True, (192, 192, 192))
-            surface.blit(text, (int(screen_x) - text.get_width()//2, int(screen_y) + scaled_radius + 5))
+        if has_trail[k]:
+            trail_points = decimate_polyline(world_to_screen_array(
+                world.trail_points(i), camera_x, camera_y, scale, width, height
+            ))
+            for part in clip_polyline(trail_points, width, height):
+                pygame.draw.aalines(surface, cfg['TRAIL_COLOR'], False, part.tolist())
+        if not visible[k] or point[k]:
+            continue
+
+        center = screen[k].tolist()
+        r = int(scaled_radius[k])
+        color = tuple(world.color[i].tolist())
+        pygame.draw.circle(surface, color, center, r)
+
+        if r > HIGHLIGHT_RADIUS:
+            highlight = tuple(min(c + 40, 255) for c in color)
+            pygame.draw.circle(surface, highlight, center, max(1, int(r * 0.5)))
+
+        if static[k] and r >= LABEL_RADIUS:
+            text = render_text(world.bodies[i].name, 20, (192, 192, 192))
+            surface.blit(text, (center[0] - text.get_width()//2, center[1] + r + 5))
+
+    # Тела меньше пикселя - точками, как круги радиуса 1
+    if point.any():
+        draw_points(surface, screen[point], world.color[select][point])
 
 def create_station(earth):
     orbit_radius = random.randint(150, 250)
@@ -101,7 +226,7 @@ def create_station(earth):
     
     return CelestialBody(
         x, y, 1, cfg['STATION_RADIUS'], cfg['STATION_COLOR'],
-        "Станция", is_static=False, vx=vx, vy=vy
+        "Станция", is_static=False, vx=vx, vy=vy, world=earth.world
     )
 
 def create_bodies():
@@ -116,14 +241,14 @@ def create_bodies():
         earth.x + moon_distance * math.cos(moon_angle),
         earth.y + moon_distance * math.sin(moon_angle),
         cfg['MOON_MASS'], cfg['MOON_RADIUS'], 
-        cfg['MOON_COLOR'], "Луна"
+        cfg['MOON_COLOR'], "Луна", world=earth.world
     )
     
     asteroid = CelestialBody(
         random.randint(-cfg['SCREEN_SIZE'][0]//2, cfg['SCREEN_SIZE'][0]//2),
         random.randint(-cfg['SCREEN_SIZE'][1]//2, cfg['SCREEN_SIZE'][1]//2),
         cfg['ASTEROID_MASS'], cfg['ASTEROID_RADIUS'], 
-        cfg['ASTEROID_COLOR'], "Астероид"
+        cfg['ASTEROID_COLOR'], "Астероид", world=earth.world
     )
     
     station = create_station(earth)
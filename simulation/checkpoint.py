@@ -0,0 +1,100 @@
+"""Сохранение и восстановление полного состояния симуляции.
+
+Снимок - сжатый архив .npz без pickle: массивы World и частиц плюс
+JSON-строка meta с версией формата, именами и цветами тел, состоянием
+генераторов случайных чисел и произвольным словарем state программы.
+Следы хранятся только для тел, у которых есть кольцо следа (trail_slot).
+Память блочного интегратора (BlockState) сохраняется, чтобы продолжение
+со снимка совпадало с непрерывным прогоном.
+"""
+import json
+import random
+import numpy as np
+
+VERSION = 2
+WORLD_ARRAYS = ('pos', 'vel', 'mass', 'radius', 'static', 'prev_pos',
+                'trail_slot', 'trail_head', 'trail_count')
+PARTICLE_ARRAYS = ('x', 'y', 'vx', 'vy', 'size', 'life', 'alive')
+BLOCK_ARRAYS = ('acc', 'jerk', 'last', 'known')
+
+
+def save_checkpoint(path, world, particles=None, state=None):
+    """Записывает world, частицы и словарь state (значения JSON) в path"""
+    from simulation.integrators import BlockState
+
+    n = world.count
+    arrays = {f'world_{name}': getattr(world, name)[:n] for name in WORLD_ARRAYS}
+    arrays['world_trail'] = world.trail[:world.rings]
+    python_state = random.getstate()
+    meta = {
+        'version': VERSION,
+        'trail_length': world.trail_length,
+        'names': [body.name for body in world.bodies],
+        'colors': [list(body.color) for body in world.bodies],
+        'random': [python_state[0], list(python_state[1]), python_state[2]],
+        'state': state or {},
+    }
+    block = world.integrator_state
+    if isinstance(block, BlockState) and block.version == world.version and block.count == n:
+        arrays.update({f'block_{name}': getattr(block, name) for name in BLOCK_ARRAYS})
+        meta['block_clock'] = block.clock
+    if particles is not None:
+        arrays.update({f'particles_{name}': getattr(particles, name) for name in PARTICLE_ARRAYS})
+        meta['particles_rng'] = particles.rng.bit_generator.state
+    arrays['meta'] = np.array(json.dumps(meta))
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+
+
+def load_checkpoint(path):
+    """Восстанавливает снимок.
+
+    Возвращает (bodies, particles, state); particles - None, если
+    частицы не сохранялись. Глобальный random тоже восстанавливается.
+    """
+    from simulation.celestial import CelestialBody
+    from simulation.integrators import BlockState
+    from simulation.particles import ParticleSystem
+    from simulation.physics import World
+
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta.get('version') not in (1, VERSION):
+            raise ValueError(f"{path}: неподдерживаемая версия снимка {meta.get('version')}")
+
+        n = len(meta['names'])
+        world = World(capacity=max(n, 1), trail_length=meta['trail_length'])
+        bodies = [
+            CelestialBody(0, 0, 0, 0, tuple(color), name, world=world)
+            for name, color in zip(meta['names'], meta['colors'])
+        ]
+        for name in WORLD_ARRAYS:
+            if f'world_{name}' in data:
+                getattr(world, name)[:n] = data[f'world_{name}']
+        trail = data['world_trail']
+        if meta['version'] == 1:
+            # В версии 1 кольцо следа было у каждого тела; кольцо 0 - пустое
+            world.trail_slot[:n] = np.arange(1, n + 1)
+            trail = np.concatenate([np.zeros((1,) + trail.shape[1:], dtype=trail.dtype), trail])
+        world.trail = trail
+        world.rings = len(trail)
+        world.update_trail_bounds()
+        # Шаги и импульсы не сохраняются: прогноз траектории должен считаться заново
+        world.version += 1
+
+        if 'block_clock' in meta:
+            block = world.integrator_state = BlockState(world)
+            for name in BLOCK_ARRAYS:
+                getattr(block, name)[:] = data[f'block_{name}']
+            block.clock = meta['block_clock']
+
+        particles = None
+        if 'particles_alive' in data:
+            particles = ParticleSystem(capacity=len(data['particles_alive']))
+            for name in PARTICLE_ARRAYS:
+                getattr(particles, name)[:] = data[f'particles_{name}']
+            particles.rng.bit_generator.state = meta['particles_rng']
+
+    version, internal, gauss = meta['random']
+    random.setstate((version, tuple(internal), gauss))
+    return bodies, particles, meta['state']
@@ -0,0 +1,236 @@
+"""Столкновения тел.
+
+Широкая фаза - равномерная пространственная хеш-сетка, узкая - точная
+проверка пересечения окружностей радиусов radius. Исход задается
+[PHYSICS] collisions:
+    none    - тела проходят друг сквозь друга, как в исходной модели
+    merge   - слияние с сохранением массы и импульса
+    bounce  - отскок с коэффициентом восстановления [PHYSICS] restitution
+    destroy - подвижные участники столкновения удаляются
+Статичные тела не сталкиваются друг с другом и никогда не удаляются.
+"""
+from functools import lru_cache
+import numpy as np
+from simulation.config import CONFIG as cfg
+
+MODES = ('none', 'merge', 'bounce', 'destroy')
+# Размер ячейки в медианных радиусах тел, если [PHYSICS] collision_cell = 0
+AUTO_CELL = 4.0
+# Ключ ячейки (cx, cy) - одно число int64
+_OFFSET = 1 << 30
+_STRIDE = 1 << 31
+# Ключ крупных тел: они не попадают в сетку и проверяются со всеми напрямую
+_LARGE = -1
+# Половина окрестности 3x3: каждая пара соседних ячеек просматривается один раз
+_NEIGHBOURS = ((1, -1), (1, 0), (1, 1), (0, 1))
+# До этого числа тел пары проверяются перебором, без сетки
+BRUTE_FORCE_LIMIT = 32
+
+
+def _expand(first, begin, count):
+    """Пары (first[k], begin[k] + t) для t < count[k] без циклов Python"""
+    total = int(count.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    ends = np.cumsum(count)
+    offsets = np.arange(total) - np.repeat(ends - count, count)
+    return np.repeat(first, count), np.repeat(begin, count) + offsets
+
+
+def _cell_keys(cx, cy):
+    return cx * _STRIDE + cy
+
+
+class SpatialHash:
+    """Равномерная сетка для поиска пар пересекающихся окружностей.
+
+    Тела сортируются по ключу ячейки; порядок сохраняется между шагами,
+    и пересортировка почти упорядоченного массива (timsort) занимает
+    почти линейное время: за шаг ячейку меняет лишь малая часть тел.
+    Тела с диаметром больше ячейки считаются крупными и проверяются
+    со всеми остальными напрямую.
+    """
+
+    def __init__(self, cell_size=None):
+        self.cell_size_setting = cell_size
+        self.cell_size = None
+        self.order = None
+
+    def reset(self):
+        """Забывает порядок и размер ячейки, например после удаления тел"""
+        self.cell_size = None
+        self.order = None
+
+    def pairs(self, pos, radius):
+        """Пары (i, j), i < j, пересекающихся окружностей, в порядке возрастания"""
+        n = len(pos)
+        if n < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        if n <= BRUTE_FORCE_LIMIT:
+            return _brute_force_pairs(pos, radius)
+
+        if self.order is None or len(self.order) != n:
+            self.cell_size = self.cell_size_setting or AUTO_CELL * max(float(np.median(radius)), 0.5)
+            self.order = None
+        large = 2 * radius > self.cell_size
+        # Координаты ячеек, сдвинутые к неотрицательным (с запасом под соседей)
+        cells = np.floor(pos / self.cell_size)
+        np.clip(cells, 1 - _OFFSET, _OFFSET - 2, out=cells)
+        cells = cells.astype(np.int64) + _OFFSET
+        keys = _cell_keys(cells[:, 0], cells[:, 1])
+        keys[large] = _LARGE
+
+        if self.order is None:
+            order = np.argsort(keys, kind='stable')
+        else:
+            order = self.order[np.argsort(keys[self.order], kind='stable')]
+        self.order = order
+        sorted_keys = keys[order]
+        in_grid = sorted_keys != _LARGE
+        positions = np.arange(n)
+
+        # Занятые ячейки: ключ, начало и конец группы в отсортированном порядке
+        new_cell = np.empty(n, dtype=bool)
+        new_cell[0] = True
+        np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=new_cell[1:])
+        starts = np.flatnonzero(new_cell)
+        ends = np.append(starts[1:], n)
+        cell_keys = sorted_keys[starts]
+        cell_of = np.cumsum(new_cell) - 1
+
+        # Пары внутри одной ячейки: с телами, стоящими дальше в той же группе
+        count = np.where(in_grid, ends[cell_of] - positions - 1, 0)
+        first, second = [], []
+        a, b = _expand(positions, positions + 1, count)
+        first.append(a)
+        second.append(b)
+
+        # Пары с соседними ячейками
+        sorted_cells = cells[order]
+        cx, cy = sorted_cells[:, 0], sorted_cells[:, 1]
+        last = len(cell_keys) - 1
+        for dx, dy in _NEIGHBOURS:
+            neighbour = _cell_keys(cx + dx, cy + dy)
+            cell = np.minimum(np.searchsorted(cell_keys, neighbour), last)
+            found = in_grid & (cell_keys[cell] == neighbour)
+            count = np.where(found, ends[cell] - starts[cell], 0)
+            a, b = _expand(positions, starts[cell], count)
+            first.append(a)
+            second.append(b)
+
+        i = order[np.concatenate(first)]
+        j = order[np.concatenate(second)]
+        d = pos[j] - pos[i]
+        reach = radius[i] + radius[j]
+        hit = np.einsum('ij,ij->i', d, d) < reach * reach
+        i, j = i[hit], j[hit]
+
+        # Крупные тела - перебором со всеми, кроме крупных с меньшим индексом
+        for index in np.flatnonzero(large):
+            d = pos - pos[index]
+            reach = radius + radius[index]
+            hit = np.einsum('ij,ij->i', d, d) < reach * reach
+            hit[index] = False
+            hit[:index] &= ~large[:index]
+            others = np.flatnonzero(hit)
+            i = np.concatenate([i, np.full(len(others), index)])
+            j = np.concatenate([j, others])
+
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        ordered = np.lexsort((j, i))
+        return i[ordered], j[ordered]
+
+
+@lru_cache(maxsize=BRUTE_FORCE_LIMIT)
+def _all_pairs(n):
+    return np.triu_indices(n, 1)
+
+
+def _brute_force_pairs(pos, radius):
+    i, j = _all_pairs(len(pos))
+    d = pos[j] - pos[i]
+    reach = radius[i] + radius[j]
+    hit = np.einsum('ij,ij->i', d, d) < reach * reach
+    return i[hit], j[hit]
+
+
+def _bounce(world, i, j, restitution):
+    pos, vel = world.pos, world.vel
+    static = world.static[:world.count]
+    inverse = np.where(static, 0.0, 1.0 / np.where(static, 1.0, world.mass[:world.count]))
+
+    d = pos[j] - pos[i]
+    dist = np.hypot(d[:, 0], d[:, 1])
+    normal = np.zeros_like(d)
+    normal[:, 0] = 1.0
+    np.divide(d, dist[:, np.newaxis], out=normal, where=dist[:, np.newaxis] > 0)
+    weight = inverse[i] + inverse[j]
+
+    # Импульс вдоль нормали только для сближающихся тел
+    approach = np.einsum('ij,ij->i', vel[j] - vel[i], normal)
+    impulse = np.where(approach < 0, -(1 + restitution) * approach / weight, 0.0)
+    np.add.at(vel, i, -(impulse * inverse[i])[:, np.newaxis] * normal)
+    np.add.at(vel, j, (impulse * inverse[j])[:, np.newaxis] * normal)
+
+    # Раздвигаем тела, чтобы столкновение не повторялось на следующем шаге
+    push = (world.radius[i] + world.radius[j] - dist) / weight
+    np.add.at(pos, i, -(push * inverse[i])[:, np.newaxis] * normal)
+    np.add.at(pos, j, (push * inverse[j])[:, np.newaxis] * normal)
+
+
+def _merge(world, i, j):
+    """Сливает пары, в которых оба тела еще не поглощены; возвращает поглощенные"""
+    absorbed = set()
+    pos, vel, mass, radius, static = world.pos, world.vel, world.mass, world.radius, world.static
+    for a, b in zip(i.tolist(), j.tolist()):
+        if a in absorbed or b in absorbed:
+            continue
+        # Остается статичное или более массивное тело
+        if static[b] or (not static[a] and mass[b] > mass[a]):
+            a, b = b, a
+        total = mass[a] + mass[b]
+        if not static[a]:
+            pos[a] = (pos[a] * mass[a] + pos[b] * mass[b]) / total
+            vel[a] = (vel[a] * mass[a] + vel[b] * mass[b]) / total
+        # Площадь сохраняется
+        radius[a] = np.hypot(radius[a], radius[b])
+        mass[a] = total
+        absorbed.add(b)
+    return sorted(absorbed)
+
+
+def resolve_collisions(world, mode=None, spatial_hash=None):
+    """Находит и обрабатывает столкновения тел world.
+
+    Возвращает число удаленных тел (слияние и уничтожение).
+    """
+    mode = mode or cfg['COLLISIONS']
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим столкновений: {mode}")
+    if mode == 'none':
+        return 0
+    if spatial_hash is None:
+        spatial_hash = SpatialHash()
+
+    n = world.count
+    i, j = spatial_hash.pairs(world.pos[:n], world.radius[:n])
+    if len(i) == 0:
+        return 0
+    moving = ~(world.static[i] & world.static[j])
+    i, j = i[moving], j[moving]
+    if len(i) == 0:
+        return 0
+
+    if mode == 'bounce':
+        _bounce(world, i, j, cfg['RESTITUTION'])
+        return 0
+    if mode == 'merge':
+        removed = _merge(world, i, j)
+    else:
+        both = np.concatenate([i, j])
+        removed = np.unique(both[~world.static[both]])
+    world.remove(removed)
+    spatial_hash.reset()
+    return len(removed)
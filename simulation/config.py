@@ -1,23 +1,24 @@
 import configparser
-import pygame
+import os
+from collections.abc import MutableMapping
 
-def load_config():
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.ini')
+
+
+def parse_color(color_str):
+    return tuple(map(int, color_str.split(',')))
+
+
+def read_settings(path):
     config = configparser.ConfigParser()
-    config.read('config.ini')
-    
-    # Получаем информацию об экране
-    pygame.display.init()
-    screen_info = pygame.display.Info()
-    DESKTOP_WIDTH, DESKTOP_HEIGHT = screen_info.current_w, screen_info.current_h
-    
+    config.read(path)
+
     # Загрузка графических настроек
     graphics = config['GRAPHICS']
-    
-    def parse_color(color_str):
-        return tuple(map(int, color_str.split(',')))
-    
+    # Раздел трансляции необязателен
+    stream = config['STREAM'] if config.has_section('STREAM') else {}
+
     settings = {
-        'DESKTOP_SIZE': (DESKTOP_WIDTH, DESKTOP_HEIGHT),
         'SCREEN_SIZE': (
             int(graphics.get('width', 1024)),
             int(graphics.get('height', 768))
@@ -36,7 +37,12 @@ def load_config():
         'THRUST_PARTICLE_COLOR': parse_color(graphics['thrust_particle_color']),
         'GRID_SIZE': int(graphics['grid_size']),
         'MAX_GRID_DIST': int(graphics['max_grid_dist']),
-        
+        'TRAIL_LENGTH': int(graphics.get('trail_length', 300)),
+        'PREDICTION_COLOR': parse_color(graphics.get('prediction_color', '90,160,90')),
+        'GHOST_COLOR': parse_color(graphics.get('ghost_color', '160,160,200')),
+        'HEATMAP': graphics.get('heatmap', 'off'),
+        'HEATMAP_TILES': int(graphics.get('heatmap_tiles', 256)),
+
         'G': float(config['PHYSICS']['g']),
         'INITIAL_SPEED': float(config['PHYSICS']['initial_speed']),
         'EARTH_MASS': float(config['PHYSICS']['earth_mass']),
@@ -47,8 +53,81 @@ def load_config():
         'ASTEROID_RADIUS': float(config['PHYSICS']['asteroid_radius']),
         'STATION_RADIUS': float(config['PHYSICS']['station_radius']),
         'IMPULSE_POWER': float(config['PHYSICS']['impulse_power']),
+        'SOLVER': config['PHYSICS'].get('solver', 'direct'),
+        'THETA': float(config['PHYSICS'].get('theta', 0.7)),
+        'INTEGRATOR': config['PHYSICS'].get('integrator', 'euler'),
+        'BLOCK_ETA': float(config['PHYSICS'].get('block_eta', 0.02)),
+        'BLOCK_LEVELS': int(config['PHYSICS'].get('block_levels', 6)),
+        'DT': float(config['PHYSICS'].get('dt', 1.0)),
+        'STEPS_PER_SECOND': float(config['PHYSICS'].get('steps_per_second', 60)),
+        'PHYSICS_BUDGET': float(config['PHYSICS'].get('physics_budget_ms', 10)) / 1000,
+        'COLLISIONS': config['PHYSICS'].get('collisions', 'none'),
+        'COLLISION_CELL': float(config['PHYSICS'].get('collision_cell', 0)),
+        'RESTITUTION': float(config['PHYSICS'].get('restitution', 0.8)),
+        'PREDICT_STEPS': int(config['PHYSICS'].get('predict_steps', 1500)),
+        'PREDICT_STRIDE': int(config['PHYSICS'].get('predict_stride', 3)),
+        'PREDICT_ATTRACTORS': int(config['PHYSICS'].get('predict_attractors', 16)),
+
+        'STREAM_HOST': stream.get('host', '127.0.0.1'),
+        'STREAM_PORT': int(stream.get('port', 8765)),
+        'STREAM_RATE': float(stream.get('rate', 20)),
+        'STREAM_KEYFRAME_INTERVAL': int(stream.get('keyframe_interval', 30)),
     }
     return settings
 
-# Создаем глобальную переменную CONFIG
-CONFIG = load_config()
+
+def desktop_size():
+    # pygame импортируется только здесь: чтение настроек не требует дисплея
+    import pygame
+    pygame.display.init()
+    # Info() после set_mode вернул бы размер окна, а не рабочего стола
+    return pygame.display.get_desktop_sizes()[0]
+
+
+class Config(MutableMapping):
+    """Настройки, которые читаются из файла при первом обращении.
+
+    Размер рабочего стола (DESKTOP_SIZE) запрашивается у дисплея только
+    когда он действительно нужен, например при переходе в полноэкранный режим.
+    """
+
+    def __init__(self, path=None, overrides=None):
+        self.configure(path, overrides)
+
+    def configure(self, path=None, overrides=None):
+        """Сбрасывает кэш; следующее обращение перечитает файл path"""
+        self.path = path or DEFAULT_PATH
+        self.overrides = dict(overrides or {})
+        self._settings = None
+
+    def _load(self):
+        if self._settings is None:
+            settings = read_settings(self.path)
+            settings.update(self.overrides)
+            self._settings = settings
+        return self._settings
+
+    def __getitem__(self, key):
+        settings = self._load()
+        if key == 'DESKTOP_SIZE' and key not in settings:
+            settings[key] = desktop_size()
+        return settings[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+
+    def __delitem__(self, key):
+        del self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+
+def load_config(path=None, overrides=None):
+    return Config(path, overrides)
+
+# Глобальные настройки, загружаются лениво
+CONFIG = Config()
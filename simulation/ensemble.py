@@ -0,0 +1,218 @@
+"""Ансамбль случайных запусков станции (метод Монте-Карло).
+
+Пример: python -m simulation.ensemble -n 100000 --steps 5000 --workers 8
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from simulation.config import CONFIG as cfg
+from simulation.celestial import create_bodies
+from simulation.integrators import block, get_integrator
+
+# Исходы запуска
+STABLE, CRASH, ESCAPE = 0, 1, 2
+# Как часто (в шагах) проверяется уход и отбрасываются члены с известным
+# исходом; столкновения проверяются на каждом шаге, иначе быстрая станция
+# может пролететь сквозь тело между проверками
+CHECK_EVERY = 10
+
+
+class Ensemble:
+    """M копий одной системы, продвигаемых одновременно.
+
+    Массивы имеют форму (тело, член ансамбля, xy), поэтому интеграторы
+    из simulation.integrators работают с ансамблем так же, как с World.
+    """
+
+    def __init__(self, pos, vel, mass, radius, static, names):
+        self.pos = pos
+        self.vel = vel
+        self.mass = mass
+        self.radius = radius
+        self.static = static
+        self.names = names
+
+    @classmethod
+    def sample(cls, members, seed=0, start=0):
+        """Члены start..start+members-1 серии seed, каждый из create_bodies"""
+        pos, vel = [], []
+        for i in range(start, start + members):
+            random.seed(seed * 2**32 + i)
+            world = create_bodies()[0].world
+            pos.append(world.pos[:world.count].copy())
+            vel.append(world.vel[:world.count].copy())
+        n = world.count
+        return cls(
+            np.stack(pos, axis=1), np.stack(vel, axis=1),
+            world.mass[:n].copy(), world.radius[:n].copy(), world.static[:n].copy(),
+            [body.name for body in world.bodies]
+        )
+
+    @property
+    def members(self):
+        return self.pos.shape[1]
+
+    def take(self, members):
+        """Ансамбль только из указанных членов"""
+        return Ensemble(self.pos[:, members], self.vel[:, members], self.mass,
+                        self.radius, self.static, self.names)
+
+    def dynamic(self):
+        return np.flatnonzero(~self.static)
+
+    def accelerations(self, dynamic=None):
+        if dynamic is None:
+            dynamic = self.dynamic()
+        # (цель, источник, член ансамбля, xy)
+        d = self.pos[np.newaxis, :, :, :] - self.pos[dynamic, np.newaxis, :, :]
+        r2 = np.maximum(np.einsum('...k,...k->...', d, d), 1.0)
+        w = self.mass[np.newaxis, :, np.newaxis] / (r2 * np.sqrt(r2))
+        return dynamic, cfg['G'] * np.einsum('tsm,tsmk->tmk', w, d)
+
+    def advance(self, steps, dt=1.0, integrator=None):
+        integrate = ensemble_integrator(integrator)
+        dynamic = self.dynamic()
+        for _ in range(steps):
+            integrate(self, dynamic, dt)
+
+
+def ensemble_integrator(name=None):
+    """Интегратор для ансамбля; блочные шаги не поддерживаются"""
+    integrate = get_integrator(name)
+    if integrate is block:
+        # Уровни шагов выбираются по телам World, а у членов ансамбля они разные
+        raise ValueError("Интегратор block не поддерживается ансамблем; "
+                         "выберите euler, leapfrog, yoshida4 или rk4")
+    return integrate
+
+
+def classify(ensemble, body, escape_radius, outcome, crashed_into, event_step, step,
+             escapes=True):
+    """Отмечает новые столкновения и уходы тела body, пока исход не определен.
+
+    escapes=False - только столкновения (проверка на каждом шаге).
+    """
+    pending = outcome == STABLE
+    static = np.flatnonzero(ensemble.static)
+    d = ensemble.pos[static] - ensemble.pos[body]
+    dist = np.hypot(d[..., 0], d[..., 1])
+    hit = dist < (ensemble.radius[static] + ensemble.radius[body])[:, np.newaxis]
+
+    crash = pending & hit.any(axis=0)
+    outcome[crash] = CRASH
+    crashed_into[crash] = static[hit[:, crash].argmax(axis=0)]
+    event_step[crash] = step
+    if not escapes:
+        return
+
+    # Уход: тело далеко и его энергия в поле статичных тел положительна
+    v = ensemble.vel[body]
+    potential = -cfg['G'] * np.sum(ensemble.mass[static][:, np.newaxis] / np.maximum(dist, 1), axis=0)
+    bound = 0.5 * np.einsum('mk,mk->m', v, v) + potential < 0
+    escape = pending & ~crash & ~bound & (dist.min(axis=0) > escape_radius)
+    outcome[escape] = ESCAPE
+    event_step[escape] = step
+
+
+def init_worker(settings):
+    """Настройки родительского процесса в процессе пула"""
+    cfg.configure(overrides=settings)
+
+
+def run_shard(seed, start, members, steps, dt=1.0, integrator=None, escape_radius=5000.0):
+    """Один кусок ансамбля; выполняется в отдельном процессе"""
+    ensemble = Ensemble.sample(members, seed, start)
+    # Станция - последнее тело create_bodies
+    body = ensemble.dynamic()[-1]
+
+    outcome = np.full(members, STABLE, dtype=np.int8)
+    crashed_into = np.full(members, -1, dtype=np.int16)
+    event_step = np.full(members, -1, dtype=np.int64)
+    # Продолжают считаться только члены с неопределенным исходом
+    active = np.arange(members)
+    done = 0
+    while done < steps and len(active):
+        chunk = min(CHECK_EVERY, steps - done)
+        result = (outcome[active], crashed_into[active], event_step[active])
+        for i in range(chunk):
+            ensemble.advance(1, dt, integrator)
+            done += 1
+            classify(ensemble, body, escape_radius, *result, done, escapes=i == chunk - 1)
+        outcome[active], crashed_into[active], event_step[active] = result
+        pending = result[0] == STABLE
+        if not pending.all():
+            ensemble = ensemble.take(pending)
+            active = active[pending]
+    return outcome, crashed_into, event_step, ensemble.names
+
+
+def run_ensemble(members, steps, seed=0, dt=1.0, integrator=None, workers=None,
+                 shard_size=5000, escape_radius=5000.0):
+    """Запускает members случайных систем и собирает статистику исходов.
+
+    Возвращает словарь: outcome, crashed_into, event_step (по членам),
+    counts и fractions (по исходам).
+    """
+    # Ошибка выбора интегратора - до запуска процессов
+    ensemble_integrator(integrator)
+    shards = [(start, min(shard_size, members - start)) for start in range(0, members, shard_size)]
+    args = [(seed, start, count, steps, dt, integrator, escape_radius)
+            for start, count in shards]
+
+    if workers == 1 or len(shards) == 1:
+        # В этом процессе действуют его собственные настройки
+        results = [run_shard(*a) for a in args]
+    else:
+        # Процессы пула получают настройки этого процесса, включая измененные в коде
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(dict(cfg),)) as pool:
+            results = list(pool.map(run_shard, *zip(*args)))
+
+    outcome = np.concatenate([r[0] for r in results])
+    crashed_into = np.concatenate([r[1] for r in results])
+    event_step = np.concatenate([r[2] for r in results])
+    names = results[0][3]
+
+    counts = {
+        'stable': int(np.count_nonzero(outcome == STABLE)),
+        'escape': int(np.count_nonzero(outcome == ESCAPE)),
+    }
+    for index, name in enumerate(names):
+        hits = int(np.count_nonzero((outcome == CRASH) & (crashed_into == index)))
+        if hits:
+            counts[f'crash: {name}'] = hits
+    return {
+        'outcome': outcome,
+        'crashed_into': crashed_into,
+        'event_step': event_step,
+        'counts': counts,
+        'fractions': {key: value / members for key, value in counts.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Статистика исходов случайных запусков")
+    parser.add_argument('-n', '--members', type=int, default=10000, help="число запусков")
+    parser.add_argument('--steps', type=int, default=3000, help="число шагов")
+    parser.add_argument('--seed', type=int, default=0, help="зерно серии")
+    parser.add_argument('--dt', type=float, default=1.0, help="шаг по времени")
+    parser.add_argument('--integrator', default=None, help="euler, leapfrog, yoshida4, rk4")
+    parser.add_argument('--workers', type=int, default=None, help="число процессов")
+    parser.add_argument('--shard', type=int, default=5000, help="запусков на процесс за раз")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    result = run_ensemble(args.members, args.steps, seed=args.seed, dt=args.dt,
+                          integrator=args.integrator, workers=args.workers,
+                          shard_size=args.shard)
+    elapsed = time.perf_counter() - start
+
+    for key, count in result['counts'].items():
+        print(f"{key:>20}: {count:>8} ({result['fractions'][key]:.1%})")
+    print(f"{args.members} запусков x {args.steps} шагов за {elapsed:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
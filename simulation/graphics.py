@@ -1,4 +1,6 @@
 import math
+from functools import lru_cache
+import numpy as np
 import pygame
 from simulation.config import CONFIG as cfg
 
@@ -26,50 +28,88 @@ def draw_compass(surface, vx, vy, x, y, size=40):
                    (end_x + arrow_size * math.cos(angle - math.pi * 0.8), 
                     end_y + arrow_size * math.sin(angle - math.pi * 0.8)))
 
+@lru_cache(maxsize=8)
+def gravity_grid_points(static_bodies, grid_size, width, height):
+    """Узлы сетки в мировых координатах со смещением от статичных тел.
+
+    static_bodies - кортеж (x, y, mass); результат кэшируется, так как
+    статичные тела не двигаются. Возвращает массивы (строки, столбцы).
+    """
+    num_horizontal = int(height // grid_size) + 2
+    num_vertical = int(width // grid_size) + 2
+
+    world_x = (np.arange(num_vertical) - num_vertical // 2) * float(grid_size)
+    world_y = (np.arange(num_horizontal) - num_horizontal // 2) * float(grid_size)
+    world_x, world_y = np.meshgrid(world_x, world_y)
+
+    dx = np.zeros_like(world_x)
+    dy = np.zeros_like(world_y)
+    for bx, by, mass in static_bodies:
+        dist_x = world_x - bx
+        dist_y = world_y - by
+        distance = np.maximum(np.hypot(dist_x, dist_y), 1)
+        force = mass / distance**1.7 * 40
+        dx -= force * dist_x / distance
+        dy -= force * dist_y / distance
+
+    points_x = world_x + dx
+    points_y = world_y + dy
+    points_x.flags.writeable = False
+    points_y.flags.writeable = False
+    return points_x, points_y
+
+def _draw_grid_lines(surface, xs, ys, max_dist):
+    # Сегменты длиннее max_dist пропускаются, соседние - рисуются одной ломаной
+    visible = np.hypot(np.diff(xs, axis=1), np.diff(ys, axis=1)) < max_dist
+    for row in range(xs.shape[0]):
+        mask = np.concatenate(([False], visible[row], [False]))
+        edges = np.flatnonzero(mask[1:] != mask[:-1])
+        for start, end in zip(edges[::2], edges[1::2]):
+            points = np.column_stack((xs[row, start:end + 1], ys[row, start:end + 1]))
+            pygame.draw.aalines(surface, cfg['GRID_COLOR'], False, points.tolist())
+
+# Растровый слой сетки: перерисовывается только при смене камеры или окна
+_grid_layer = {'key': None, 'surface': None}
+
+def static_bodies_of(bodies):
+    """Кортеж (x, y, mass) статичных тел из bodies"""
+    world = bodies[0].world if bodies else None
+    if world is not None and len(bodies) == world.count:
+        # Все тела мира: статичные выбираются из массивов без обхода тел
+        n = world.count
+        static = world.static[:n]
+        return tuple(map(tuple, np.column_stack(
+            (world.pos[:n][static], world.mass[:n][static])).tolist()))
+    return tuple((body.x, body.y, body.mass) for body in bodies if body.is_static)
+
 def draw_gravity_grid(surface, bodies, camera_x, camera_y, scale):
-    grid_size = cfg['GRID_SIZE']
-    num_horizontal = int(surface.get_height() // grid_size) + 2
-    num_vertical = int(surface.get_width() // grid_size) + 2
-    
-    points = []
-    for i in range(num_horizontal):
-        row = []
-        for j in range(num_vertical):
-            world_x = (j - num_vertical//2) * grid_size
-            world_y = (i - num_horizontal//2) * grid_size
-            
-            dx, dy = 0, 0
-            for body in bodies:
-                if body.is_static:
-                    dist_x = world_x - body.x
-                    dist_y = world_y - body.y
-                    distance = max(math.sqrt(dist_x**2 + dist_y**2), 1)
-                    force = body.mass / (distance**1.7) * 40
-                    dx += -force * dist_x / distance
-                    dy += -force * dist_y / distance
-            
-            screen_x = (world_x + dx - camera_x) * scale + surface.get_width()/2
-            screen_y = (world_y + dy - camera_y) * scale + surface.get_height()/2
-            row.append((screen_x, screen_y))
-        points.append(row)
-    
-    # Горизонтальные линии
-    for i in range(num_horizontal):
-        for j in range(num_vertical - 1):
-            x1, y1 = points[i][j]
-            x2, y2 = points[i][j+1]
-            distance = math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-            if distance < cfg['MAX_GRID_DIST'] * scale:
-                pygame.draw.aaline(surface, cfg['GRID_COLOR'], (x1, y1), (x2, y2))
-    
-    # Вертикальные линии
-    for j in range(num_vertical):
-        for i in range(num_horizontal - 1):
-            x1, y1 = points[i][j]
-            x2, y2 = points[i+1][j]
-            distance = math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-            if distance < cfg['MAX_GRID_DIST'] * scale:
-                pygame.draw.aaline(surface, cfg['GRID_COLOR'], (x1, y1), (x2, y2))
+    width, height = surface.get_size()
+    static_bodies = static_bodies_of(bodies)
+    key = (static_bodies, cfg['GRID_SIZE'], width, height, camera_x, camera_y, scale,
+           cfg['GRID_COLOR'], cfg['BACKGROUND'], cfg['MAX_GRID_DIST'])
+
+    if _grid_layer['key'] != key:
+        points_x, points_y = gravity_grid_points(static_bodies, cfg['GRID_SIZE'], width, height)
+        screen_x = (points_x - camera_x) * scale + width / 2
+        screen_y = (points_y - camera_y) * scale + height / 2
+
+        # Линии рисуются на фоне, фон затем становится прозрачным
+        layer = _grid_layer['surface']
+        if layer is None or layer.get_size() != (width, height):
+            layer = pygame.Surface((width, height), 0, surface)
+        layer.fill(cfg['BACKGROUND'])
+        layer.set_colorkey(cfg['BACKGROUND'])
+
+        max_dist = cfg['MAX_GRID_DIST'] * scale
+        # Горизонтальные линии
+        _draw_grid_lines(layer, screen_x, screen_y, max_dist)
+        # Вертикальные линии
+        _draw_grid_lines(layer, screen_x.T, screen_y.T, max_dist)
+
+        _grid_layer['key'] = key
+        _grid_layer['surface'] = layer
+
+    surface.blit(_grid_layer['surface'], (0, 0))
 
 def draw_dashed_line(surface, color, start_pos, end_pos, dash_length=10):
     x1, y1 = start_pos
@@ -98,9 +138,121 @@ def draw_arrow(surface, color, pos, direction, size=10):
     
     pygame.draw.aalines(surface, color, True, arrow_points)
 
+# Прозрачность частиц квантуется, чтобы спрайтов было немного
+ALPHA_BUCKET = 16
+
+@lru_cache(maxsize=256)
+def particle_sprite(size, alpha, color):
+    sprite = pygame.Surface((size * 2, size * 2), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, (*color, alpha), (size, size), size)
+    return sprite
+
+def draw_particles(surface, particles, camera_x, camera_y, scale):
+    active = particles.active()
+    if len(active) == 0:
+        return
+
+    width, height = surface.get_size()
+    size = particles.size[active]
+    screen_x = ((particles.x[active] - camera_x) * scale + width / 2 - size).astype(int)
+    screen_y = ((particles.y[active] - camera_y) * scale + height / 2 - size).astype(int)
+    alpha = np.minimum(255, particles.life[active] * 25)
+    alpha = np.minimum(255, (alpha + ALPHA_BUCKET // 2) // ALPHA_BUCKET * ALPHA_BUCKET)
+
+    color = cfg['THRUST_PARTICLE_COLOR']
+    surface.blits([
+        (particle_sprite(s, a, color), (x, y))
+        for s, a, x, y in zip(size.tolist(), alpha.tolist(), screen_x.tolist(), screen_y.tolist())
+    ], doreturn=False)
+
 def world_to_screen(x, y, camera_x, camera_y, scale, screen_width, screen_height):
     """Преобразует мировые координаты в экранные"""
     return (
         (x - camera_x) * scale + screen_width/2,
         (y - camera_y) * scale + screen_height/2
     )
+
+def world_to_screen_array(points, camera_x, camera_y, scale, screen_width, screen_height):
+    """То же для массива точек (K, 2)"""
+    offset = np.array((camera_x, camera_y))
+    center = np.array((screen_width / 2, screen_height / 2))
+    return (np.asarray(points, dtype=np.float64) - offset) * scale + center
+
+def decimate_polyline(points, step=1.0):
+    """Оставляет точки ломаной примерно через каждые step пикселей длины.
+
+    Первая и последняя точки сохраняются всегда.
+    """
+    if len(points) < 3:
+        return points
+    lengths = np.hypot(*np.diff(points, axis=0).T)
+    bucket = np.floor(np.cumsum(lengths) / step)
+    keep = np.flatnonzero(np.diff(bucket, prepend=0) > 0) + 1
+    if len(keep) == 0 or keep[-1] != len(points) - 1:
+        keep = np.append(keep, len(points) - 1)
+    return points[np.concatenate(([0], keep))]
+
+def clip_polyline(points, width, height, margin=1):
+    """Части ломаной, задевающие экран width x height.
+
+    Отрезок остается, если его ограничивающий прямоугольник пересекает
+    экран; подряд идущие отрезки образуют одну ломаную.
+    """
+    if len(points) < 2:
+        return []
+    low = np.minimum(points[:-1], points[1:])
+    high = np.maximum(points[:-1], points[1:])
+    inside = ((high[:, 0] >= -margin) & (low[:, 0] <= width + margin) &
+              (high[:, 1] >= -margin) & (low[:, 1] <= height + margin))
+    if inside.all():
+        return [points]
+    edges = np.diff(inside.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    return [points[start:stop + 1] for start, stop in zip(starts.tolist(), stops.tolist())]
+
+def draw_path(surface, color, points, camera_x, camera_y, scale):
+    """Ломаная в мировых координатах, прореженная и обрезанная по экрану"""
+    width, height = surface.get_size()
+    screen = decimate_polyline(world_to_screen_array(points, camera_x, camera_y, scale, width, height))
+    for part in clip_polyline(screen, width, height):
+        pygame.draw.aalines(surface, color, False, part.tolist())
+
+def map_colors(surface, colors):
+    """Цвета RGB (K, 3) в формате пикселей surface"""
+    if surface.get_bytesize() > 1:
+        # Полноцветный формат: перевод сдвигами, как в map_rgb
+        shifts, losses, masks = surface.get_shifts(), surface.get_losses(), surface.get_masks()
+        mapped = np.full(len(colors), masks[3], dtype=np.int64)
+        for c in range(3):
+            mapped |= (colors[:, c].astype(np.int64) >> losses[c]) << shifts[c]
+        return mapped
+    unique, inverse = np.unique(colors, axis=0, return_inverse=True)
+    return np.array([surface.map_rgb(tuple(color)) for color in unique.tolist()])[inverse]
+
+def draw_points(surface, points, colors):
+    """Точки 2x2 пикселя (как круг радиуса 1) одной записью в пиксели.
+
+    points - целые экранные координаты (K, 2), colors - RGB (K, 3).
+    """
+    width, height = surface.get_size()
+    x, y = points[:, 0], points[:, 1]
+    inner = (x >= 1) & (x < width) & (y >= 1) & (y < height)
+    mapped = map_colors(surface, colors)
+    try:
+        pixels = pygame.surfarray.pixels2d(surface)
+    except ValueError:
+        # 24-битные поверхности не отображаются в массив
+        for (px, py), color in zip(points.tolist(), colors.tolist()):
+            pygame.draw.circle(surface, color, (px, py), 1)
+        return
+    # Точки целиком на экране - четыре записи без проверок
+    xi, yi, values = x[inner], y[inner], mapped[inner]
+    for dx, dy in ((-1, -1), (0, -1), (-1, 0), (0, 0)):
+        pixels[xi + dx, yi + dy] = values
+    # Точки у края - с отсечением по пикселям
+    for dx, dy in ((-1, -1), (0, -1), (-1, 0), (0, 0)):
+        px, py = x[~inner] + dx, y[~inner] + dy
+        keep = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        pixels[px[keep], py[keep]] = mapped[~inner][keep]
+    del pixels
@@ -0,0 +1,131 @@
+"""Тепловая карта гравитационного поля статичных тел.
+
+Поле - потенциал или модуль ускорения с тем же ограничением расстояния
+max(r, 1), что и в расчете сил. Оно считается массивами по плиткам
+TILE x TILE пикселей, закрепленным в мировых координатах, и записывается
+прямо в пиксели поверхности плитки. Яркость - логарифм поля.
+
+Готовые плитки хранятся в кэше LRU ([GRAPHICS] heatmap_tiles) по ключу
+(плитка, масштаб, режим, хеш статичных тел): при перемещении камеры
+считаются только открывшиеся плитки.
+"""
+import math
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+import pygame
+from simulation.config import CONFIG as cfg
+from simulation.graphics import map_colors, static_bodies_of
+
+MODES = ('potential', 'acceleration')
+# Сторона плитки, пикселей
+TILE = 128
+# Диапазон поля в порядках величины от значения на расстоянии 1 от всей массы
+DECADES = {'potential': 3, 'acceleration': 6}
+# Опорные цвета палитры после цвета фона
+PALETTE = ((40, 30, 110), (150, 40, 120), (240, 130, 40), (255, 240, 150))
+
+
+@lru_cache(maxsize=4)
+def palette(background):
+    """256 цветов RGB от фона к яркому"""
+    stops = np.array((background,) + PALETTE, dtype=float)
+    t = np.linspace(0, len(stops) - 1, 256)
+    colors = np.column_stack([np.interp(t, np.arange(len(stops)), stops[:, c]) for c in range(3)])
+    colors = colors.round().astype(np.uint8)
+    colors.flags.writeable = False
+    return colors
+
+
+def field(xs, ys, static_bodies, mode):
+    """Поле в узлах сетки xs (W,) x ys (H,); массив (H, W)"""
+    g = cfg['G']
+    if mode == 'potential':
+        total = np.zeros((len(ys), len(xs)))
+        for bx, by, mass in static_bodies:
+            total += g * mass / np.maximum(np.hypot(xs - bx, ys[:, np.newaxis] - by), 1)
+        return total
+    ax = np.zeros((len(ys), len(xs)))
+    ay = np.zeros_like(ax)
+    for bx, by, mass in static_bodies:
+        dx = xs - bx
+        dy = ys[:, np.newaxis] - by
+        distance = np.maximum(np.hypot(dx, dy), 1)
+        factor = g * mass / distance**3
+        ax -= factor * dx
+        ay -= factor * dy
+    return np.hypot(ax, ay)
+
+
+class HeatmapLayer:
+    """Кэш плиток тепловой карты"""
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity or cfg['HEATMAP_TILES']
+        self.tiles = OrderedDict()
+
+    def draw(self, surface, static_bodies, mode, camera_x, camera_y, scale):
+        total_mass = sum(mass for _, _, mass in static_bodies)
+        if total_mass <= 0:
+            return
+        width, height = surface.get_size()
+        # Масштаб округляется, чтобы плитки одного уровня стыковались без щелей
+        zoom = round(scale, 6)
+        size = TILE / zoom
+        field_hash = hash((static_bodies, cfg['G'], cfg['BACKGROUND']))
+
+        # Экранная позиция плитки (tx, ty) - (tx * TILE + offset_x, ty * TILE + offset_y)
+        offset_x = round(width / 2 - camera_x * zoom)
+        offset_y = round(height / 2 - camera_y * zoom)
+        first_x, last_x = math.floor(-offset_x / TILE), math.floor((width - offset_x - 1) / TILE)
+        first_y, last_y = math.floor(-offset_y / TILE), math.floor((height - offset_y - 1) / TILE)
+
+        blits = []
+        for ty in range(first_y, last_y + 1):
+            for tx in range(first_x, last_x + 1):
+                key = (tx, ty, zoom, mode, field_hash)
+                tile = self.tiles.get(key)
+                if tile is None:
+                    tile = self._render(surface, static_bodies, total_mass, mode, tx * size, ty * size, zoom)
+                    self.tiles[key] = tile
+                else:
+                    self.tiles.move_to_end(key)
+                blits.append((tile, (tx * TILE + offset_x, ty * TILE + offset_y)))
+        surface.blits(blits, doreturn=False)
+
+        while len(self.tiles) > self.capacity:
+            self.tiles.popitem(last=False)
+
+    def _render(self, surface, static_bodies, total_mass, mode, left, top, zoom):
+        """Плитка с левым верхним углом (left, top) в мировых координатах"""
+        # Значение берется в центре пикселя
+        centers = (np.arange(TILE) + 0.5) / zoom
+        values = field(left + centers, top + centers, static_bodies, mode)
+
+        high = math.log(cfg['G'] * total_mass)
+        low = high - DECADES[mode] * math.log(10)
+        t = (np.log(np.maximum(values, 1e-300)) - low) / (high - low)
+        index = (np.clip(t, 0, 1) * 255).astype(np.intp)
+
+        tile = pygame.Surface((TILE, TILE), 0, surface)
+        colors = palette(cfg['BACKGROUND'])
+        try:
+            pixels = pygame.surfarray.pixels2d(tile)
+        except ValueError:
+            # 24-битные поверхности не отображаются в массив пикселей
+            pygame.surfarray.blit_array(tile, colors[index.T])
+            return tile
+        pixels[...] = map_colors(tile, colors)[index.T]
+        del pixels
+        return tile
+
+
+_layer = None
+
+
+def draw_heatmap(surface, bodies, mode, camera_x, camera_y, scale):
+    """Рисует тепловую карту поля статичных тел из bodies в режиме mode"""
+    global _layer
+    if _layer is None:
+        _layer = HeatmapLayer()
+    _layer.draw(surface, static_bodies_of(bodies), mode, camera_x, camera_y, scale)
@@ -0,0 +1,266 @@
+"""Интеграторы движения для World.
+
+Каждый интегратор продвигает подвижные тела dynamic (индексы или, если
+тела идут подряд, срез) на один шаг dt на месте, вычисляя ускорения
+через world.accelerations.
+Сравнение дрейфа энергии: python -m simulation.integrators
+Блочные шаги против равномерных: python -m benchmarks.timesteps
+"""
+import argparse
+import random
+import numpy as np
+from simulation.config import CONFIG as cfg
+
+# Коэффициенты Йошиды для схемы 4-го порядка
+_W1 = 1 / (2 - 2 ** (1 / 3))
+_W0 = -2 ** (1 / 3) * _W1
+YOSHIDA_DRIFT = (_W1 / 2, (_W0 + _W1) / 2, (_W0 + _W1) / 2, _W1 / 2)
+YOSHIDA_KICK = (_W1, _W0, _W1)
+
+
+def euler(world, dynamic, dt):
+    """Полунеявный метод Эйлера (1-й порядок)"""
+    _, acc = world.accelerations(dynamic)
+    world.vel[dynamic] += acc * dt
+    world.pos[dynamic] += world.vel[dynamic] * dt
+
+
+def leapfrog(world, dynamic, dt):
+    """Чехарда drift-kick-drift (2-й порядок, симплектический)"""
+    world.pos[dynamic] += world.vel[dynamic] * (dt / 2)
+    _, acc = world.accelerations(dynamic)
+    world.vel[dynamic] += acc * dt
+    world.pos[dynamic] += world.vel[dynamic] * (dt / 2)
+
+
+def yoshida4(world, dynamic, dt):
+    """Композиция Йошиды (4-й порядок, симплектический)"""
+    for i, kick in enumerate(YOSHIDA_KICK):
+        world.pos[dynamic] += world.vel[dynamic] * (YOSHIDA_DRIFT[i] * dt)
+        _, acc = world.accelerations(dynamic)
+        world.vel[dynamic] += acc * (kick * dt)
+    world.pos[dynamic] += world.vel[dynamic] * (YOSHIDA_DRIFT[-1] * dt)
+
+
+class BlockState:
+    """Память блочного интегратора: последние ускорения тел и их производные.
+
+    Привязана к составу тел World (version); после добавления или
+    удаления тел история начинается заново.
+    """
+
+    def __init__(self, world):
+        n = world.count
+        self.version = world.version
+        self.count = n
+        self.acc = np.zeros((n, 2))
+        self.jerk = np.zeros((n, 2))
+        # Время последнего вычисления ускорения; known - оно было
+        self.last = np.zeros(n)
+        self.known = np.zeros(n, dtype=bool)
+        self.clock = 0.0
+
+    def update(self, world, indices):
+        """Ускорения тел indices в текущих позициях; рывок - по разности с прошлыми"""
+        _, acc = world.accelerations(indices)
+        known = self.known[indices]
+        elapsed = (self.clock - self.last[indices])[:, np.newaxis]
+        jerk = np.zeros_like(acc)
+        np.divide(acc - self.acc[indices], elapsed, out=jerk, where=known[:, np.newaxis] & (elapsed > 0))
+        self.jerk[indices] = jerk
+        self.acc[indices] = acc
+        self.last[indices] = self.clock
+        self.known[indices] = True
+        return acc
+
+
+def block_levels(acc, jerk, dt, eta=None, max_level=None):
+    """Уровни шагов dt / 2**level по критерию h = eta * |a| / |da/dt|"""
+    eta = eta or cfg['BLOCK_ETA']
+    max_level = cfg['BLOCK_LEVELS'] if max_level is None else max_level
+    a = np.hypot(acc[:, 0], acc[:, 1])
+    j = np.hypot(jerk[:, 0], jerk[:, 1])
+    # Без рывка шаг не ограничен; без ускорения при рывке - самый мелкий
+    ratio = np.zeros_like(a)
+    np.divide(j * dt, eta * a, out=ratio, where=a > 0)
+    ratio[(a == 0) & (j > 0)] = np.inf
+    with np.errstate(divide='ignore'):
+        level = np.ceil(np.log2(ratio))
+    return np.clip(np.nan_to_num(level, neginf=0), 0, max_level).astype(np.int64)
+
+
+def block(world, dynamic, dt):
+    """Иерархические блочные шаги (чехарда drift-kick-drift для каждого тела).
+
+    Каждое тело получает шаг dt / 2**level по своим ускорению и рывку
+    ([PHYSICS] block_eta, block_levels). Все тела дрейфуют по самой
+    мелкой сетке времени, но ускорения, основная цена шага, считаются
+    для тела только в середине его собственного шага. При всех уровнях
+    0 совпадает с leapfrog.
+    """
+    state = world.integrator_state
+    if not isinstance(state, BlockState) or state.version != world.version or state.count != world.count:
+        state = world.integrator_state = BlockState(world)
+    new = dynamic[~state.known[dynamic]]
+    if len(new):
+        state.update(world, new)
+
+    levels = block_levels(state.acc[dynamic], state.jerk[dynamic], dt)
+    fine = 2 << int(levels.max())
+    # Длина шага тела в долях dt / fine; середина шага - через span / 2
+    span = fine >> levels
+    h = dt / fine
+    # Моменты, в которых хотя бы одно тело получает толчок
+    ticks = np.unique(np.concatenate([np.arange(s // 2, fine, s) for s in np.unique(span).tolist()]))
+    # Подвижные тела обычно идут подряд: срез вместо выборки по индексам
+    moving = dynamic
+    if dynamic[-1] - dynamic[0] + 1 == len(dynamic):
+        moving = slice(int(dynamic[0]), int(dynamic[-1]) + 1)
+
+    start = state.clock
+    last = 0
+    for tick in ticks.tolist() + [fine]:
+        world.pos[moving] += world.vel[moving] * ((tick - last) * h)
+        state.clock = start + tick * h
+        last = tick
+        if tick == fine:
+            break
+        active = (tick % span) == span // 2
+        indices = dynamic[active]
+        acc = state.update(world, indices)
+        world.vel[indices] += acc * (span[active] * h)[:, np.newaxis]
+
+
+def rk4(world, dynamic, dt):
+    """Классический метод Рунге-Кутты 4-го порядка"""
+    # Копии: dynamic может быть срезом, а срез - это представление
+    x0 = world.pos[dynamic].copy()
+    v0 = world.vel[dynamic].copy()
+
+    _, a1 = world.accelerations(dynamic)
+    v1 = v0
+    world.pos[dynamic] = x0 + v1 * (dt / 2)
+    _, a2 = world.accelerations(dynamic)
+    v2 = v0 + a1 * (dt / 2)
+    world.pos[dynamic] = x0 + v2 * (dt / 2)
+    _, a3 = world.accelerations(dynamic)
+    v3 = v0 + a2 * (dt / 2)
+    world.pos[dynamic] = x0 + v3 * dt
+    _, a4 = world.accelerations(dynamic)
+    v4 = v0 + a3 * dt
+
+    world.pos[dynamic] = x0 + (v1 + 2 * v2 + 2 * v3 + v4) * (dt / 6)
+    world.vel[dynamic] = v0 + (a1 + 2 * a2 + 2 * a3 + a4) * (dt / 6)
+
+
+INTEGRATORS = {
+    'euler': euler,
+    'leapfrog': leapfrog,
+    'verlet': leapfrog,
+    'yoshida4': yoshida4,
+    'rk4': rk4,
+    'block': block,
+}
+
+
+def get_integrator(name=None):
+    name = name or cfg['INTEGRATOR']
+    try:
+        return INTEGRATORS[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный интегратор: {name}") from None
+
+
+def _potential(r):
+    # Потенциал, согласованный с ограничением расстояния max(r, 1)
+    return np.where(r >= 1, -1 / np.maximum(r, 1), (r * r - 3) / 2)
+
+
+def energy(world):
+    """Полная энергия подвижных тел во внешнем поле статичных"""
+    n = world.count
+    dynamic = world.dynamic()
+    pos, mass = world.pos[:n], world.mass[:n]
+    vel = world.vel[dynamic]
+    kinetic = 0.5 * np.sum(mass[dynamic] * np.einsum('ij,ij->i', vel, vel))
+
+    potential = 0.0
+    for i in dynamic:
+        d = pos - pos[i]
+        r = np.hypot(d[:, 0], d[:, 1])
+        # Пары подвижных тел учитываются один раз
+        pair = world.static[:n] | (np.arange(n) > i)
+        potential += mass[i] * np.sum(mass[pair] * _potential(r[pair]))
+    return kinetic + cfg['G'] * potential
+
+
+def angular_momentum(world):
+    """Момент импульса подвижных тел относительно центра масс статичных.
+
+    Сохраняется только если статичные тела расположены в одной точке.
+    """
+    n = world.count
+    static = world.static[:n]
+    center = np.zeros(2)
+    if static.any() and world.mass[:n][static].sum() > 0:
+        center = np.average(world.pos[:n][static], axis=0, weights=world.mass[:n][static])
+    dynamic = world.dynamic()
+    r = world.pos[dynamic] - center
+    v = world.vel[dynamic]
+    return float(np.sum(world.mass[dynamic] * (r[:, 0] * v[:, 1] - r[:, 1] * v[:, 0])))
+
+
+def drift_report(world, steps, dt=1.0, integrator=None, samples=100):
+    """Продвигает world и возвращает максимальный относительный дрейф
+    энергии и момента импульса."""
+    e0 = energy(world)
+    l0 = angular_momentum(world)
+    energy_drift = momentum_drift = 0.0
+    every = max(1, steps // samples)
+    done = 0
+    while done < steps:
+        chunk = min(every, steps - done)
+        world.advance(chunk, dt, trails=False, integrator=integrator)
+        done += chunk
+        energy_drift = max(energy_drift, abs(energy(world) - e0) / max(abs(e0), 1e-12))
+        momentum_drift = max(momentum_drift, abs(angular_momentum(world) - l0) / max(abs(l0), 1e-12))
+    return {'energy_drift': energy_drift, 'angular_momentum_drift': momentum_drift}
+
+
+def circular_orbit(radius=200.0):
+    """Станция на круговой орбите вокруг Земли - эталон для сравнения"""
+    from simulation.celestial import CelestialBody
+    earth = CelestialBody(0, 0, cfg['EARTH_MASS'], cfg['EARTH_RADIUS'], cfg['EARTH_COLOR'], "Земля")
+    speed = (cfg['G'] * cfg['EARTH_MASS'] / radius) ** 0.5
+    station = CelestialBody(
+        radius, 0, 1, cfg['STATION_RADIUS'], cfg['STATION_COLOR'], "Станция",
+        is_static=False, vy=speed, world=earth.world
+    )
+    return earth, station
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Дрейф энергии и момента импульса")
+    parser.add_argument('--steps', type=int, default=20000, help="число шагов dt=1")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="случайная система create_bodies вместо круговой орбиты")
+    parser.add_argument('--dt', type=float, nargs='+', default=[1.0, 5.0, 20.0])
+    args = parser.parse_args(argv)
+
+    print(f"{'integrator':>10} {'dt':>6} {'steps':>7} {'dE/E':>10} {'dL/L':>10}")
+    for name in ('euler', 'leapfrog', 'yoshida4', 'rk4', 'block'):
+        for dt in args.dt:
+            if args.seed is not None:
+                from simulation.celestial import create_bodies
+                random.seed(args.seed)
+                world = create_bodies()[0].world
+            else:
+                world = circular_orbit()[0].world
+            steps = max(1, int(args.steps / dt))
+            report = drift_report(world, steps, dt, integrator=name)
+            print(f"{name:>10} {dt:>6g} {steps:>7} "
+                  f"{report['energy_drift']:>10.2e} {report['angular_momentum_drift']:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
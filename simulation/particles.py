@@ -0,0 +1,58 @@
+import numpy as np
+from simulation.config import CONFIG as cfg
+
+
+class ParticleSystem:
+    """Пул частиц фиксированного размера в параллельных массивах.
+
+    Новые частицы занимают свободные ячейки; если пул заполнен,
+    лишние частицы просто не создаются.
+    """
+
+    def __init__(self, capacity=4096, seed=None):
+        self.capacity = capacity
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.size = np.zeros(capacity, dtype=np.int64)
+        self.life = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    def emit_thrust(self, x, y, direction, count=5):
+        """Выброс частиц из сопла тела в точке (x, y)"""
+        slots = np.flatnonzero(~self.alive)[:count]
+        n = len(slots)
+        if n == 0:
+            return
+
+        angle = direction + self.rng.uniform(-0.3, 0.3, n)
+        dist = cfg['STATION_RADIUS'] + self.rng.integers(0, 5, n, endpoint=True)
+        speed = self.rng.uniform(1.0, 3.0, n)
+        cos, sin = np.cos(angle), np.sin(angle)
+
+        self.x[slots] = x - dist * cos
+        self.y[slots] = y - dist * sin
+        self.vx[slots] = speed * cos
+        self.vy[slots] = speed * sin
+        self.size[slots] = self.rng.integers(2, 5, n, endpoint=True)
+        self.life[slots] = self.rng.integers(10, 20, n, endpoint=True)
+        self.alive[slots] = True
+
+    def update(self):
+        alive = self.alive
+        self.x[alive] += self.vx[alive]
+        self.y[alive] += self.vy[alive]
+        self.life[alive] -= 1
+        alive &= self.life > 0
+
+    def clear(self):
+        self.alive[:] = False
+
+    def active(self):
+        """Индексы живых частиц"""
+        return np.flatnonzero(self.alive)
@@ -0,0 +1,474 @@
+import itertools
+import math
+import time
+import warnings
+from contextlib import contextmanager
+import numpy as np
+from simulation.config import CONFIG as cfg
+from simulation.barnes_hut import QuadTree
+from simulation.collisions import SpatialHash, resolve_collisions
+from simulation.integrators import block, get_integrator
+
+# Максимальное число попарных элементов в одном блоке вычислений
+# (ограничивает память при больших N)
+PAIR_BLOCK = 1 << 20
+# До этого числа пар ускорения считаются одним выражением без блоков
+SMALL_PAIRS = 1024
+
+
+def gravity_accelerations(targets, sources, masses, g):
+    """Ускорения точек targets (K, 2) от тел sources (N, 2) с массами masses (N,).
+
+    Расстояние ограничено снизу единицей, как в исходной модели.
+    Вклад тела в самого себя равен нулю, так как dx = dy = 0.
+    """
+    targets = np.asarray(targets, dtype=np.float64)
+    n = len(sources)
+    if n == 0 or len(targets) == 0:
+        return np.zeros_like(targets)
+    if len(targets) * n <= SMALL_PAIRS:
+        # Малые системы (ускорение времени): меньше вызовов NumPy на шаг
+        d = sources[np.newaxis, :, :] - targets[:, np.newaxis, :]
+        r2 = np.maximum((d * d).sum(axis=2), 1.0)
+        w = masses / (r2 * np.sqrt(r2))
+        return g * (w[:, :, np.newaxis] * d).sum(axis=1)
+
+    acc = np.empty_like(targets)
+
+    sx = sources[:, 0]
+    sy = sources[:, 1]
+    block = max(1, PAIR_BLOCK // n)
+    for start in range(0, len(targets), block):
+        chunk = targets[start:start + block]
+        dx = sx - chunk[:, 0, np.newaxis]
+        dy = sy - chunk[:, 1, np.newaxis]
+        r2 = dx * dx
+        r2 += dy * dy
+        np.maximum(r2, 1.0, out=r2)
+        # w = m / r^3
+        w = np.sqrt(r2)
+        w *= r2
+        np.divide(masses, w, out=w)
+        acc[start:start + block, 0] = np.einsum('ij,ij->i', w, dx)
+        acc[start:start + block, 1] = np.einsum('ij,ij->i', w, dy)
+    acc *= g
+    return acc
+
+
+class TimeStepper:
+    """Фиксированный шаг физики, не зависящий от частоты кадров.
+
+    Реальное время кадра копится в аккумуляторе и расходуется целыми
+    шагами dt; при ускорении времени за кадр выполняется много шагов.
+    Шагов за кадр не больше, чем укладывается в budget секунд по
+    измеренному времени шага; остальное время отбрасывается.
+    """
+
+    WARP_LEVELS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    def __init__(self, dt=None, rate=None, budget=None):
+        self.dt = dt or cfg['DT']
+        self.rate = rate or cfg['STEPS_PER_SECOND']
+        self.budget = budget or cfg['PHYSICS_BUDGET']
+        # Время одного шага по последнему замеру, секунд (0 - еще не измерено)
+        self.step_seconds = 0.0
+        self.warp_index = 0
+        self.accumulator = 0.0
+
+    @property
+    def warp(self):
+        return self.WARP_LEVELS[self.warp_index]
+
+    def faster(self):
+        self.warp_index = min(self.warp_index + 1, len(self.WARP_LEVELS) - 1)
+
+    def slower(self):
+        self.warp_index = max(self.warp_index - 1, 0)
+
+    @property
+    def max_steps(self):
+        """Сколько шагов укладывается в бюджет времени"""
+        if math.isinf(self.budget):
+            return math.inf
+        if self.step_seconds <= 0:
+            # До первого замера неизвестно, сколько длится шаг
+            return 1
+        return max(1, int(self.budget / self.step_seconds))
+
+    @property
+    def alpha(self):
+        """Доля шага, прошедшая после последнего шага физики"""
+        return min(self.accumulator / self.dt, 1.0)
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    def advance(self, world, real_seconds):
+        """Продвигает world на накопившееся время и возвращает число шагов"""
+        steps = self.take_steps(real_seconds)
+        if steps:
+            start = time.perf_counter()
+            world.advance(steps, self.dt)
+            self.step_seconds = (time.perf_counter() - start) / steps
+        return steps
+
+    def take_steps(self, real_seconds):
+        """Число целых шагов, накопившихся за real_seconds"""
+        self.accumulator += real_seconds * self.rate * self.warp * self.dt
+        steps = int(self.accumulator // self.dt)
+        limit = self.max_steps
+        if steps > limit:
+            # Не успеваем: лишнее время отбрасывается, чтобы не копить отставание
+            steps = limit
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.dt
+        return steps
+
+
+class World:
+    """Состояние системы в виде массивов (structure of arrays).
+
+    Тела CelestialBody хранят только индекс в этих массивах.
+    """
+
+    # Массивы, первая ось которых - тело
+    ARRAYS = ('pos', 'vel', 'mass', 'radius', 'static', 'color', 'prev_pos',
+              'trail_slot', 'trail_head', 'trail_count', 'trail_min', 'trail_max')
+    # Источник номеров serial
+    _serials = itertools.count(1)
+
+    def __init__(self, capacity=16, trail_length=None):
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.mass = np.zeros(capacity)
+        self.radius = np.zeros(capacity)
+        self.static = np.zeros(capacity, dtype=bool)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.bodies = []
+        # Позиции до последнего шага, для интерполяции при отрисовке
+        self.prev_pos = np.zeros((capacity, 2))
+        # Если задан (simulation.recording.Recorder), пишет каждый шаг
+        self.recorder = None
+        # Номер системы, не повторяющийся за время работы (id объектов
+        # повторяются после сборки мусора); копия получает номер источника
+        self.serial = next(World._serials)
+        # Счетчики изменений состава тел и записей следов (для copy_from)
+        self.version = 0
+        self.trail_writes = 0
+        self.copy_source = None
+        # Число выполненных шагов и приложенных импульсов (для прогноза траектории)
+        self.steps = 0
+        self.impulses = 0
+        # Память интеграторов между шагами (simulation.integrators.BlockState)
+        self.integrator_state = None
+        # Точки следов текущей пачки шагов: [тела, точки, сколько записано]
+        self._pending_trails = None
+        # Широкая фаза столкновений; порядок тел сохраняется между шагами
+        self.spatial_hash = SpatialHash(cfg['COLLISION_CELL'] or None)
+
+        # Кольцевые буферы следов: (кольцо, точка, xy), позиция записи и длина.
+        # Кольцо выделяется телу при первой записи следа (статичным - никогда);
+        # кольцо 0 пустое и означает, что своего кольца у тела нет
+        self.trail_length = trail_length or cfg['TRAIL_LENGTH']
+        self.trail = np.zeros((1, self.trail_length, 2), dtype=np.float32)
+        self.rings = 1
+        self.trail_slot = np.zeros(capacity, dtype=np.int64)
+        self.trail_head = np.zeros(capacity, dtype=np.int64)
+        self.trail_count = np.zeros(capacity, dtype=np.int64)
+        # Границы следов для отсечения при отрисовке; могут быть шире следа
+        self.trail_min = np.zeros((capacity, 2), dtype=np.float32)
+        self.trail_max = np.zeros((capacity, 2), dtype=np.float32)
+
+    def _grow(self, capacity):
+        for name in self.ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, body, x, y, mass, radius, is_static=True, vx=0, vy=0, color=(255, 255, 255)):
+        if self.count == len(self.mass):
+            self._grow(max(16, 2 * self.count))
+        i = self.count
+        self.pos[i] = (x, y)
+        self.prev_pos[i] = (x, y)
+        self.vel[i] = (vx, vy)
+        self.mass[i] = mass
+        self.radius[i] = radius
+        self.static[i] = is_static
+        self.color[i] = color
+        self.bodies.append(body)
+        self.count += 1
+        self.version += 1
+        return i
+
+    def add_many(self, bodies, pos, vel, mass, radius, static, color=(255, 255, 255)):
+        """Добавляет тела массивами за одну операцию; возвращает их индексы"""
+        k = len(bodies)
+        if self.count + k > len(self.mass):
+            self._grow(max(16, 2 * self.count, self.count + k))
+        indices = np.arange(self.count, self.count + k)
+        self.pos[indices] = pos
+        self.prev_pos[indices] = pos
+        self.vel[indices] = vel
+        self.mass[indices] = mass
+        self.radius[indices] = radius
+        self.static[indices] = static
+        self.color[indices] = color
+        self.bodies.extend(bodies)
+        self.count += k
+        self.version += 1
+        return indices
+
+    def remove(self, indices):
+        """Удаляет тела indices; остальные сдвигаются, сохраняя порядок.
+
+        Индексы оставшихся CelestialBody обновляются, у удаленных index
+        становится None. Запись траекторий рассчитана на постоянный набор
+        тел и на этом завершается с предупреждением RuntimeWarning.
+        """
+        n = self.count
+        keep = np.ones(n, dtype=bool)
+        keep[indices] = False
+        if keep.all():
+            return
+        # Точки следов текущей пачки шагов относятся к прежним индексам
+        self._flush_trails()
+        if self.recorder is not None:
+            recorder, self.recorder = self.recorder, None
+            recorder.close()
+            warnings.warn(f"запись {recorder.file.name} остановлена на шаге "
+                          f"{recorder.steps}: набор тел изменился",
+                          RuntimeWarning, stacklevel=2)
+
+        survivors = np.flatnonzero(keep)
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            array[:len(survivors)] = array[survivors]
+            array[len(survivors):n] = 0
+        # Кольца удаленных тел освобождаются, остальные сдвигаются к началу
+        slots = self.trail_slot[:len(survivors)]
+        owners = np.flatnonzero(slots)
+        self.trail[1:len(owners) + 1] = self.trail[slots[owners]]
+        slots[owners] = np.arange(1, len(owners) + 1)
+        self.rings = len(owners) + 1
+        for index in np.flatnonzero(~keep):
+            self.bodies[index].index = None
+        # Индексы меняются только начиная с первого удаленного тела
+        first = int(np.argmin(keep))
+        self.bodies = [self.bodies[index] for index in survivors]
+        for index in range(first, len(self.bodies)):
+            self.bodies[index].index = index
+        self.count = len(survivors)
+        self.version += 1
+
+    def copy_from(self, source):
+        """Делает этот World копией состояния source (без тел bodies).
+
+        Если этот World уже копировал тот же source и состав тел с тех пор
+        не менялся, из следов переносятся только новые точки. Возвращает
+        True, если состав тел изменился и копия сделана полностью.
+        """
+        n = source.count
+        length = source.trail_length
+        written = source.trail_writes - self.trail_writes
+        rings = source.rings
+        full = (self.copy_source is not source or self.version != source.version or
+                self.trail_length != length or self.rings != rings or
+                not 0 <= written < length)
+        if self.trail_length != length or len(self.trail) < rings:
+            self.trail_length = length
+            self.trail = np.zeros((rings, length, 2), dtype=np.float32)
+        if len(self.mass) < n:
+            self._grow(n)
+
+        for name in self.ARRAYS:
+            getattr(self, name)[:n] = getattr(source, name)[:n]
+        if full:
+            self.trail[:rings] = source.trail[:rings]
+        elif written:
+            rows = self.trail_slot[:n, np.newaxis]
+            slots = (source.trail_head[:n, np.newaxis] - 1 - np.arange(written)) % length
+            self.trail[rows, slots] = source.trail[rows, slots]
+
+        self.count = n
+        self.copy_source = source
+        self.serial = source.serial
+        self.rings = rings
+        self.version = source.version
+        self.trail_writes = source.trail_writes
+        self.steps = source.steps
+        self.impulses = source.impulses
+        return full
+
+    def dynamic(self):
+        """Индексы подвижных тел"""
+        return np.flatnonzero(~self.static[:self.count])
+
+    def accelerations(self, dynamic=None):
+        """Ускорения всех подвижных тел: (индексы, массив (K, 2))"""
+        n = self.count
+        if dynamic is None:
+            dynamic = self.dynamic()
+        if cfg['SOLVER'] == 'barnes_hut':
+            tree = QuadTree(self.pos[:n], self.mass[:n])
+            acc = tree.accelerations(self.pos[dynamic], cfg['G'], cfg['THETA'])
+        else:
+            acc = gravity_accelerations(
+                self.pos[dynamic], self.pos[:n], self.mass[:n], cfg['G']
+            )
+        return dynamic, acc
+
+    def step(self, dt=1.0, trails=True, integrator=None):
+        """Один шаг для всех подвижных тел"""
+        self.advance(1, dt, trails, integrator)
+
+    def advance(self, steps, dt=1.0, trails=True, integrator=None):
+        """Несколько шагов подряд без повторной подготовки данных.
+
+        integrator - имя из simulation.integrators.INTEGRATORS,
+        по умолчанию [PHYSICS] integrator. После каждого шага
+        обрабатываются столкновения ([PHYSICS] collisions).
+        """
+        dynamic = self.dynamic()
+        if steps <= 0 or len(dynamic) == 0:
+            return
+        integrate = get_integrator(integrator)
+        collisions = cfg['COLLISIONS']
+        moving = self._moving(dynamic, integrate)
+        if trails:
+            self._start_trails(dynamic, steps)
+        try:
+            for i in range(steps):
+                if i == steps - 1:
+                    self.prev_pos[:self.count] = self.pos[:self.count]
+                integrate(self, moving, dt)
+                self.steps += 1
+                # remove() при слиянии или разрушении сначала сбрасывает точки следов
+                if collisions != 'none' and resolve_collisions(self, collisions, self.spatial_hash):
+                    dynamic = self.dynamic()
+                    if len(dynamic) == 0:
+                        break
+                    moving = self._moving(dynamic, integrate)
+                    if trails:
+                        self._start_trails(dynamic, steps - i)
+                if trails:
+                    pending = self._pending_trails
+                    pending[1][pending[2] % len(pending[1])] = self.pos[moving]
+                    pending[2] += 1
+                if self.recorder is not None:
+                    self.recorder.record()
+        finally:
+            self._flush_trails()
+
+    @staticmethod
+    def _moving(dynamic, integrate):
+        """Подвижные тела для интегратора: срез, если они идут подряд"""
+        # Срез дешевле выборки по индексам; блочный интегратор берет индексы сам
+        if integrate is not block and dynamic[-1] - dynamic[0] + 1 == len(dynamic):
+            return slice(int(dynamic[0]), int(dynamic[-1]) + 1)
+        return dynamic
+
+    def _start_trails(self, dynamic, steps):
+        """Копит точки следов шагов пачки; в следы попадут последние trail_length"""
+        self._flush_trails()
+        history = np.empty((min(steps, self.trail_length), len(dynamic), 2))
+        self._pending_trails = [dynamic, history, 0]
+
+    def _flush_trails(self):
+        """Пишет накопленные точки следов в кольцевые буферы"""
+        pending, self._pending_trails = self._pending_trails, None
+        if pending is None or pending[2] == 0:
+            return
+        dynamic, history, filled = pending
+        size = len(history)
+        order = np.arange(max(0, filled - size), filled) % size
+        self.record_trail_points(dynamic, history[order], filled)
+
+    @contextmanager
+    def interpolated(self, alpha):
+        """Временно подменяет позиции промежуточными между шагами.
+
+        alpha = 0 - состояние до последнего шага, 1 - текущее.
+        """
+        n = self.count
+        actual = self.pos
+        self.pos = actual.copy()
+        self.pos[:n] = self.prev_pos[:n] + (actual[:n] - self.prev_pos[:n]) * alpha
+        try:
+            yield
+        finally:
+            self.pos = actual
+
+    def record_trails(self, indices):
+        """Добавляет текущие позиции тел indices в их следы"""
+        indices = np.asarray(indices, dtype=np.intp)
+        self.record_trail_points(indices, self.pos[indices][np.newaxis])
+
+    def record_trail_points(self, indices, points, total=None):
+        """Добавляет в следы тел indices точки points (P, K, 2), от старых к новым.
+
+        total - сколько точек было всего, если из них переданы только
+        последние P (более ранние все равно были бы вытеснены из буфера).
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        length = self.trail_length
+        added = len(points)
+        total = added if total is None else total
+        rings = self.trail_rings(indices)
+        head = self.trail_head[indices]
+        # Более ранние точки вытеснены: запись идет с того места, где их бы не стало
+        first = (head + total - added) % length
+        slots = (first[:, np.newaxis] + np.arange(added)) % length
+        self.trail[rings[:, np.newaxis], slots] = points.transpose(1, 0, 2)
+        self.trail_head[indices] = (head + total) % length
+        count = self.trail_count[indices]
+        self.trail_count[indices] = np.minimum(count + total, length)
+        self.trail_writes += total
+
+        # Границы только расширяются, а после полного оборота буфера
+        # пересчитываются точно
+        low, high = points.min(axis=0), points.max(axis=0)
+        empty = (count == 0)[:, np.newaxis]
+        self.trail_min[indices] = np.where(empty, low, np.minimum(self.trail_min[indices], low))
+        self.trail_max[indices] = np.where(empty, high, np.maximum(self.trail_max[indices], high))
+        full = indices[(head + total >= length) & (count + total >= length)]
+        if len(full):
+            self.update_trail_bounds(full)
+
+    def trail_rings(self, indices):
+        """Кольца следов тел indices; телам без кольца оно выделяется"""
+        rings = self.trail_slot[indices]
+        missing = indices[rings == 0]
+        if len(missing):
+            needed = self.rings + len(missing)
+            if needed > len(self.trail):
+                trail = np.zeros((max(needed, 2 * len(self.trail)),) + self.trail.shape[1:],
+                                 dtype=self.trail.dtype)
+                trail[:self.rings] = self.trail[:self.rings]
+                self.trail = trail
+            self.trail_slot[missing] = np.arange(self.rings, needed)
+            self.rings = needed
+            rings = self.trail_slot[indices]
+        return rings
+
+    def update_trail_bounds(self, indices=None):
+        """Точные границы следов тел indices (по умолчанию всех)"""
+        if indices is None:
+            indices = np.arange(self.count)
+        block = max(1, PAIR_BLOCK // self.trail_length)
+        for start in range(0, len(indices), block):
+            chunk = indices[start:start + block]
+            age = (self.trail_head[chunk, np.newaxis] - 1 - np.arange(self.trail_length)) % self.trail_length
+            valid = (age < self.trail_count[chunk, np.newaxis])[:, :, np.newaxis]
+            points = self.trail[self.trail_slot[chunk]]
+            self.trail_min[chunk] = np.where(valid, points, np.inf).min(axis=1)
+            self.trail_max[chunk] = np.where(valid, points, -np.inf).max(axis=1)
+
+    def trail_points(self, index):
+        """След тела в порядке от старых точек к новым, массив (K, 2)"""
+        count = self.trail_count[index]
+        start = self.trail_head[index] - count
+        return self.trail[self.trail_slot[index]].take(np.arange(start, start + count), axis=0, mode='wrap')
@@ -0,0 +1,229 @@
+"""Прогноз траектории станции для прицеливания импульсом.
+
+Станция продвигается вперед в малом World, где кроме нее только самые
+массивные тела ([PHYSICS] predict_attractors), тем же шагом dt и тем же
+интегратором, что и сама модель. Если притягивающие тела статичны, как
+в системе по умолчанию, прогноз совпадает с будущим движением.
+
+Расчет идет в фоновом потоке, а готовый путь кэшируется. Он остается
+верным, пока в World не приложен импульс, не изменился состав тел и не
+сменилась сама система: ключ кэша - (serial, version, impulses). По мере
+движения станции показывается оставшаяся часть пути, а сам путь
+наращивается с конца, без пересчета с начала.
+
+Призрак - путь после импульса в направлении курсора. Направления
+квантуются, последние призраки хранятся в кэше LRU по ключу (ключ кэша,
+направление). Пока станция движется, готовый призрак переносится в ее
+текущее положение и пересчитывается от него не чаще GHOST_INTERVAL.
+"""
+import math
+import queue
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from simulation.celestial import CelestialBody
+from simulation.config import CONFIG as cfg
+from simulation.physics import World
+
+# Число квантованных направлений импульса для призрака
+GHOST_DIRECTIONS = 360
+# Размер кэша призраков
+GHOST_CACHE = 64
+# Наименьший интервал пересчета призрака того же направления, секунд
+GHOST_INTERVAL = 0.5
+
+
+def cache_key(world):
+    """Ключ состояния world; снимки потока физики дают ключ своего источника"""
+    return (world.serial, world.version, world.impulses)
+
+
+class Path:
+    """Точки пути каждые stride шагов; points[0] - положение на шаге start.
+
+    ended - станция погибла при столкновении, и путь не продолжается.
+    """
+
+    def __init__(self, key, start, stride, points, ended=False):
+        self.key = key
+        self.start = start
+        self.stride = stride
+        self.points = points
+        self.ended = ended
+
+    @property
+    def end(self):
+        """Шаг последней точки"""
+        return self.start + (len(self.points) - 1) * self.stride
+
+    def remaining(self, step):
+        """Точки пути начиная с шага step"""
+        first = max(0, -(-(step - self.start) // self.stride))
+        return self.points[first:]
+
+
+class TrajectoryPredictor(threading.Thread):
+    """Фоновый расчет пути станции и призраков импульса.
+
+    predict и ghost вызываются из цикла отрисовки каждый кадр: они лишь
+    сверяют ключ кэша и при необходимости ставят задание в очередь.
+    Пока путь считается, они возвращают None.
+    """
+
+    def __init__(self, steps=None, stride=None, attractors=None):
+        super().__init__(name='predictor', daemon=True)
+        self.steps = steps or cfg['PREDICT_STEPS']
+        self.stride = stride or cfg['PREDICT_STRIDE']
+        self.attractors = attractors or cfg['PREDICT_ATTRACTORS']
+        self.jobs = queue.Queue()
+
+        # Опубликованные потоком результаты
+        self.path = None
+        self.ghost_result = None
+        # Заказанные и выполненные расчеты пути с начала
+        self.requested = None
+        self.base_requests = 0
+        self.base_done = 0
+        self.extending = None
+        self.ghost_requested = None
+        self.ghost_submitted = 0.0
+        # Кэш призраков: (ключ, направление) -> Path; только для цикла отрисовки
+        self.ghosts = OrderedDict()
+
+        # Малый World на конце пути; только для потока прогноза
+        self._world = None
+        self._station = None
+
+    # Сторона отрисовки
+
+    def predict(self, world, station):
+        """Оставшийся путь станции (массив (K, 2)) или None"""
+        key = cache_key(world)
+        path = self.path
+        # Путь неверен или станция ушла дальше его конца (большое ускорение времени)
+        if path is None or path.key != key or (not path.ended and world.steps > path.end):
+            if self.requested != key or self.base_requests == self.base_done:
+                self.requested = key
+                self.base_requests += 1
+                inputs = self._inputs(world, station)
+                inputs['request'] = self.base_requests
+                self._submit('base', key, inputs)
+            return None
+        # Наращивание, когда впереди осталось меньше половины горизонта
+        if (not path.ended and path.end - world.steps < self.steps // 2 and
+                self.extending != (key, path.end)):
+            self.extending = (key, path.end)
+            self._submit('extend', key, world.steps)
+        return path.remaining(world.steps)
+
+    def ghost(self, world, station, direction):
+        """Путь станции после импульса в направлении direction или None"""
+        quantum = round(direction / (2 * math.pi) * GHOST_DIRECTIONS) % GHOST_DIRECTIONS
+        key = (cache_key(world), quantum)
+        result = self.ghost_result
+        if result is not None and self.ghosts.get(result.key) is not result:
+            self.ghosts[result.key] = result
+            if len(self.ghosts) > GHOST_CACHE:
+                self.ghosts.popitem(last=False)
+
+        cached = self.ghosts.get(key)
+        # Призрак того же направления устарел, пока станция двигалась
+        stale = cached is None or (cached.start != world.steps and
+                                   time.perf_counter() - self.ghost_submitted >= GHOST_INTERVAL)
+        if stale and (self.ghost_requested is None or self.ghost_requested == self.ghost_done()):
+            # Новый призрак заказывается, только когда поток закончил прежний
+            self.ghost_requested = (key, world.steps)
+            self.ghost_submitted = time.perf_counter()
+            inputs = self._inputs(world, station)
+            angle = quantum * 2 * math.pi / GHOST_DIRECTIONS
+            inputs['vel'][-1] += cfg['IMPULSE_POWER'] * np.array([math.cos(angle), math.sin(angle)])
+            self._submit('ghost', key, inputs)
+        if cached is None:
+            return None
+        self.ghosts.move_to_end(key)
+        # Призрак начинается в положении станции на шаге своего расчета
+        return cached.points + (world.pos[station.index] - cached.points[0])
+
+    def ghost_done(self):
+        result = self.ghost_result
+        return (result.key, result.start) if result is not None else None
+
+    def stop(self):
+        if self.ident is not None:
+            self.jobs.put(('stop', None, None))
+            self.join()
+
+    def _submit(self, kind, key, data):
+        if self.ident is None:
+            self.start()
+        self.jobs.put((kind, key, data))
+
+    def _inputs(self, world, station):
+        """Копия притягивающих тел и станции (станция - последняя)"""
+        n = world.count
+        others = np.flatnonzero(np.arange(n) != station.index)
+        if len(others) > self.attractors:
+            heaviest = np.argpartition(world.mass[others], -self.attractors)[-self.attractors:]
+            others = np.sort(others[heaviest])
+        chosen = np.append(others, station.index)
+        inputs = {name: getattr(world, name)[chosen].copy()
+                  for name in ('pos', 'vel', 'mass', 'radius', 'static')}
+        inputs['step'] = world.steps
+        return inputs
+
+    # Поток прогноза
+
+    def run(self):
+        while True:
+            jobs = [self.jobs.get()]
+            while True:
+                try:
+                    jobs.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            # Из одинаковых заданий важно только последнее
+            latest = {kind: (key, data) for kind, key, data in jobs}
+            if 'stop' in latest:
+                return
+            if 'base' in latest:
+                self._base(*latest['base'])
+            if 'extend' in latest and 'base' not in latest:
+                self._extend(*latest['extend'])
+            if 'ghost' in latest:
+                key, data = latest['ghost']
+                world, station = self._build(data)
+                points, ended = self._propagate(world, station, self.steps)
+                self.ghost_result = Path(key, data['step'], self.stride, points, ended)
+
+    def _build(self, data):
+        world = World(capacity=len(data['mass']), trail_length=1)
+        bodies = CelestialBody.many(world, data['pos'], data['vel'], data['mass'],
+                                    data['radius'], (0, 0, 0), '', is_static=data['static'])
+        return world, bodies[-1]
+
+    def _propagate(self, world, station, steps):
+        """Продвигает world на steps шагов; точки станции каждые stride шагов"""
+        points = [world.pos[station.index].copy()]
+        for _ in range(steps // self.stride):
+            world.advance(self.stride, cfg['DT'], trails=False)
+            if not station.alive:
+                return np.array(points), True
+            points.append(world.pos[station.index].copy())
+        return np.array(points), False
+
+    def _base(self, key, data):
+        self._world, self._station = self._build(data)
+        points, ended = self._propagate(self._world, self._station, self.steps)
+        self.path = Path(key, data['step'], self.stride, points, ended)
+        self.base_done = data['request']
+
+    def _extend(self, key, step):
+        path = self.path
+        if path is None or path.key != key or path.ended:
+            return
+        points, ended = self._propagate(self._world, self._station, self.steps // 2)
+        # Пройденная часть пути отбрасывается
+        first = max(0, (step - path.start) // self.stride)
+        self.path = Path(key, path.start + first * self.stride, self.stride,
+                         np.concatenate([path.points[first:], points[1:]]), ended)
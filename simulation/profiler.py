@@ -0,0 +1,82 @@
+import csv
+import time
+import numpy as np
+
+
+class FrameProfiler:
+    """Время фаз кадра по time.perf_counter.
+
+    Фазы отмечаются вызовом mark(name) после их окончания: время фазы -
+    интервал от предыдущей отметки. Выключенный профайлер сразу
+    возвращается из mark, поэтому накладные расходы ничтожны.
+    """
+
+    PHASES = ('events', 'particles', 'physics', 'grid', 'bodies', 'effects', 'hud', 'flip')
+
+    def __init__(self, window=240, csv_path=None):
+        self.show = False
+        self.index = {name: i for i, name in enumerate(self.PHASES)}
+        self.samples = np.zeros((window, len(self.PHASES)))
+        self.row = np.zeros(len(self.PHASES))
+        self.frames = 0
+        self.last = 0.0
+        # Кадр, в середине которого профайлер включили, не записывается
+        self.partial = False
+
+        self.csv_file = None
+        self.csv = None
+        if csv_path:
+            self.csv_file = open(csv_path, 'w', newline='')
+            self.csv = csv.writer(self.csv_file)
+            self.csv.writerow(['frame'] + [f'{name}_ms' for name in self.PHASES] + ['total_ms'])
+        self.enabled = self.csv is not None
+
+    def toggle(self):
+        self.show = not self.show
+        if self.show and self.csv is None:
+            self.row[:] = 0
+            self.last = time.perf_counter()
+            self.partial = True
+        self.enabled = self.show or self.csv is not None
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.partial = False
+        self.row[:] = 0
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.row[self.index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        if not self.enabled or self.partial:
+            return
+        self.samples[self.frames % len(self.samples)] = self.row
+        self.frames += 1
+        if self.csv is not None:
+            ms = self.row * 1000
+            self.csv.writerow([self.frames] + [f'{t:.4f}' for t in ms] + [f'{ms.sum():.4f}'])
+
+    def stats(self):
+        """{фаза: (среднее, p95, максимум)} в миллисекундах, включая 'total'"""
+        filled = self.samples[:min(self.frames, len(self.samples))] * 1000
+        if len(filled) == 0:
+            return {}
+        columns = dict(zip(self.PHASES, filled.T))
+        columns['total'] = filled.sum(axis=1)
+        return {
+            name: (float(values.mean()), float(np.percentile(values, 95)), float(values.max()))
+            for name, values in columns.items()
+        }
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv = None
+            self.enabled = self.show
@@ -0,0 +1,161 @@
+"""Запись траекторий в двоичный файл и воспроизведение через memmap.
+
+Формат файла (все числа little-endian):
+    заголовок, HEADER_SIZE байт:
+        magic 8s, version u4, bodies u4, fields u4, chunk u4, dt f8,
+        steps u8 (число записанных шагов), data_offset u8
+    таблица тел, по BODY_RECORD на тело:
+        mass f8, radius f8, static u1, color 3u1, name NAME_SIZE байт UTF-8
+    данные с data_offset: steps записей формы (bodies, fields) float64,
+        поля x, y, vx, vy
+
+Записи фиксированной длины, поэтому шаг k лежит по смещению
+data_offset + k * bodies * fields * 8 и читается без копирования:
+    np.memmap(path, '<f8', 'r', offset=data_offset, shape=(steps, bodies, fields))
+"""
+import struct
+import numpy as np
+
+MAGIC = b'SGSREC\0\0'
+VERSION = 1
+FIELDS = 4
+HEADER = struct.Struct('<8sIIIId QQ')
+HEADER_SIZE = 64
+NAME_SIZE = 48
+BODY_RECORD = np.dtype([
+    ('mass', '<f8'), ('radius', '<f8'), ('static', 'u1'),
+    ('color', 'u1', 3), ('name', f'S{NAME_SIZE}'),
+])
+# Данные выравниваются для удобного отображения в память
+ALIGN = 64
+
+
+class Recorder:
+    """Пишет состояние всех тел world после каждого шага.
+
+    Записи копятся в буфере и сбрасываются на диск блоками по chunk шагов;
+    после каждого блока обновляется счетчик шагов в заголовке, так что
+    файл читается и во время записи.
+    """
+
+    def __init__(self, path, world, dt=1.0, chunk=256):
+        self.world = world
+        self.bodies = world.count
+        self.chunk = chunk
+        self.dt = dt
+        self.steps = 0
+        self.buffer = np.empty((chunk, self.bodies, FIELDS))
+        self.buffered = 0
+
+        table = np.zeros(self.bodies, dtype=BODY_RECORD)
+        table['mass'] = world.mass[:self.bodies]
+        table['radius'] = world.radius[:self.bodies]
+        table['static'] = world.static[:self.bodies]
+        table['color'] = [body.color for body in world.bodies]
+        table['name'] = [body.name.encode('utf-8')[:NAME_SIZE] for body in world.bodies]
+
+        self.data_offset = -(-(HEADER_SIZE + table.nbytes) // ALIGN) * ALIGN
+        self.file = open(path, 'wb')
+        self._write_header()
+        self.file.write(table.tobytes())
+        self.file.write(b'\0' * (self.data_offset - HEADER_SIZE - table.nbytes))
+        self.record()
+
+    def _write_header(self):
+        header = HEADER.pack(MAGIC, VERSION, self.bodies, FIELDS, self.chunk,
+                             self.dt, self.steps, self.data_offset)
+        self.file.seek(0)
+        self.file.write(header.ljust(HEADER_SIZE, b'\0'))
+
+    def record(self):
+        n = self.bodies
+        row = self.buffer[self.buffered]
+        row[:, 0:2] = self.world.pos[:n]
+        row[:, 2:4] = self.world.vel[:n]
+        self.buffered += 1
+        if self.buffered == self.chunk:
+            self.flush()
+
+    def flush(self):
+        if self.buffered == 0:
+            return
+        self.file.seek(self.data_offset + self.steps * self.buffer[0].nbytes)
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.steps += self.buffered
+        self.buffered = 0
+        self._write_header()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Replay:
+    """Записанный файл, отображенный в память; шаги доступны по индексу"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+            magic, version, bodies, fields, chunk, dt, steps, data_offset = \
+                HEADER.unpack(header[:HEADER.size])
+            if magic != MAGIC:
+                raise ValueError(f"{path}: не файл записи")
+            if version != VERSION:
+                raise ValueError(f"{path}: неподдерживаемая версия {version}")
+            table = np.frombuffer(f.read(bodies * BODY_RECORD.itemsize), dtype=BODY_RECORD)
+        if steps == 0:
+            raise ValueError(f"{path}: запись пуста")
+
+        self.path = path
+        self.dt = dt
+        self.table = table
+        self.names = [name.decode('utf-8', 'replace') for name in table['name']]
+        self.states = np.memmap(path, dtype='<f8', mode='r', offset=data_offset,
+                                shape=(steps, bodies, fields))
+
+    def __len__(self):
+        return len(self.states)
+
+    def __getitem__(self, step):
+        return self.states[step]
+
+    def create_bodies(self):
+        """Тела в новом World в состоянии первого шага"""
+        from simulation.celestial import CelestialBody
+        first = self.states[0]
+        bodies = []
+        world = None
+        for i, rec in enumerate(self.table):
+            body = CelestialBody(
+                first[i, 0], first[i, 1], rec['mass'], rec['radius'],
+                tuple(int(c) for c in rec['color']), self.names[i],
+                is_static=bool(rec['static']), vx=first[i, 2], vy=first[i, 3], world=world
+            )
+            world = body.world
+            bodies.append(body)
+        return bodies
+
+    def apply(self, world, step):
+        """Переносит шаг step в world, восстанавливая следы из записи"""
+        n = len(self.table)
+        state = self.states[step]
+        world.pos[:n] = state[:, 0:2]
+        world.prev_pos[:n] = state[:, 0:2]
+        world.vel[:n] = state[:, 2:4]
+
+        length = min(step + 1, world.trail_length)
+        dynamic = np.flatnonzero(~world.static[:n])
+        trail = self.states[step + 1 - length:step + 1, dynamic, 0:2]
+        rings = world.trail_rings(dynamic)
+        world.trail[rings, :length] = trail.transpose(1, 0, 2)
+        world.trail_head[dynamic] = length % world.trail_length
+        world.trail_count[dynamic] = length
+        world.update_trail_bounds(dynamic)
@@ -0,0 +1,141 @@
+"""Покадровая отрисовка в PNG без окна, для видео.
+
+Пример: python -m simulation.render --frames 600 --size 3840x2160 --seed 42 -o frames
+
+Модель продвигается на время кадра 1 / fps независимо от реального
+времени, поэтому при одном зерне кадры всегда одинаковы. Каждый кадр
+рисуется draw_ui на поверхности любого размера, а сжатие в PNG идет в
+пуле процессов, пока рисуется следующий кадр. Видео собирается отдельно,
+например: ffmpeg -framerate 60 -i frames/frame_%05d.png video.mp4
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from simulation.celestial import create_bodies
+from simulation.config import CONFIG as cfg
+from simulation.heatmap import MODES as HEATMAP_MODES
+from simulation.particles import ParticleSystem
+from simulation.physics import TimeStepper
+from simulation.scenario import create_scenario
+from simulation.ui import draw_ui
+
+
+def encode_png(path, size, data):
+    """Сохраняет кадр из байтов RGB в PNG; выполняется в процессе пула"""
+    pygame.image.save(pygame.image.frombuffer(data, size, 'RGB'), path)
+    return path
+
+
+def create_system(scenario=None):
+    return create_scenario(scenario) if scenario else list(create_bodies())
+
+
+def render(frames, size, output, fps=60, scale=None, warp=1, seed=None, scenario=None,
+           show_grid=True, show_info=True, heatmap=None, follow=False, jobs=None):
+    """Рисует frames кадров размера size в output/frame_NNNNN.png.
+
+    scale по умолчанию подбирается так, чтобы по высоте была видна та же
+    область, что и в окне размера [GRAPHICS] width x height. warp - одно из
+    TimeStepper.WARP_LEVELS. jobs - число процессов сжатия (по умолчанию
+    по числу ядер). Возвращает список путей к кадрам.
+    """
+    width, height = size
+    if scale is None:
+        scale = height / cfg['SCREEN_SIZE'][1]
+    if seed is not None:
+        random.seed(seed)
+    os.makedirs(output, exist_ok=True)
+    digits = max(5, len(str(frames - 1)))
+
+    bodies = create_system(scenario)
+    # Кадр всегда получает все свои шаги, сколько бы они ни длились
+    stepper = TimeStepper(budget=math.inf)
+    stepper.warp_index = TimeStepper.WARP_LEVELS.index(warp)
+    thrust_particles = ParticleSystem(seed=seed)
+    surface = pygame.Surface(size)
+
+    jobs = jobs or os.cpu_count() or 1
+    paths = []
+    # Кадры в очереди на сжатие; их число ограничено, чтобы не копить память
+    pending = deque()
+    with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for index in range(frames):
+            if index:
+                world = bodies[0].world
+                stepper.advance(world, 1 / fps)
+                if len(bodies) != world.count:
+                    # Часть тел слилась или разрушилась при столкновениях
+                    bodies = [body for body in bodies if body.alive]
+            station = next((body for body in bodies if not body.is_static), None)
+            if station is None or not station.alive:
+                # Станция погибла: как и в окне, начинается новая система
+                bodies = create_system(scenario)
+                stepper.reset()
+                station = next(body for body in bodies if not body.is_static)
+            earth = next((body for body in bodies if body.is_static), None)
+            camera_x, camera_y = (station.x, station.y) if follow else (0, 0)
+
+            surface.fill(cfg['BACKGROUND'])
+            with station.world.interpolated(stepper.alpha if index else 1.0):
+                draw_ui(
+                    surface, station, earth, scale, False, show_grid, show_info,
+                    camera_x, camera_y, width, height, bodies,
+                    thrust_particles, False, 0, stepper.warp, heatmap=heatmap
+                )
+
+            path = os.path.join(output, f"frame_{index:0{digits}d}.png")
+            if len(pending) >= 2 * jobs:
+                pending.popleft().result()
+            pending.append(pool.submit(encode_png, path, size, pygame.image.tobytes(surface, 'RGB')))
+            paths.append(path)
+        while pending:
+            pending.popleft().result()
+    return paths
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Отрисовка кадров в PNG без окна")
+    parser.add_argument('--frames', type=int, default=600, help="число кадров")
+    parser.add_argument('--size', type=parse_size, default=None, metavar='WxH',
+                        help="размер кадра (по умолчанию размер окна из config.ini)")
+    parser.add_argument('--fps', type=float, default=60, help="кадров в секунду модельного времени")
+    parser.add_argument('--scale', type=float, default=None, help="масштаб камеры")
+    parser.add_argument('--warp', type=int, default=1, choices=TimeStepper.WARP_LEVELS,
+                        help="ускорение времени")
+    parser.add_argument('--seed', type=int, default=None, help="зерно генератора")
+    parser.add_argument('--scenario', default=None, help="файл сценария вместо случайной системы")
+    parser.add_argument('--no-grid', action='store_true', help="без сетки")
+    parser.add_argument('--no-info', action='store_true', help="без надписей и компаса")
+    parser.add_argument('--heatmap', choices=HEATMAP_MODES, default=None, help="тепловая карта поля")
+    parser.add_argument('--follow', action='store_true', help="камера следует за станцией")
+    parser.add_argument('--jobs', type=int, default=None, help="число процессов сжатия PNG")
+    parser.add_argument('-o', '--output', default='frames', help="папка для кадров")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    start = time.perf_counter()
+    paths = render(args.frames, args.size or cfg['SCREEN_SIZE'], args.output, fps=args.fps,
+                   scale=args.scale, warp=args.warp, seed=args.seed, scenario=args.scenario,
+                   show_grid=not args.no_grid, show_info=not args.no_info,
+                   heatmap=args.heatmap, follow=args.follow, jobs=args.jobs)
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths)} кадров за {elapsed:.1f} с ({len(paths) / elapsed:.1f} кадр/с) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Пакетный запуск симуляции без окна.
+
+Пример: python -m simulation.run --steps 10000 --seed 42 -o run.npz
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+from simulation.celestial import create_bodies
+from simulation.scenario import create_scenario
+
+
+def run(steps, seed=None, every=1, bodies=None, dt=1.0, integrator=None):
+    """Продвигает систему на steps шагов и возвращает траектории.
+
+    Состояние записывается каждые every шагов (включая начальное).
+    integrator - имя из simulation.integrators, по умолчанию из config.ini.
+    Возвращает словарь массивов: step (F,), pos и vel (F, N, 2),
+    alive (F, N), mass (N,), static (N,) и name (N,). Строки - тела на
+    начало прогона, mass - их начальные массы. Тела, исчезнувшие при
+    столкновениях, дальше записываются с alive = False и NaN в pos и vel.
+    """
+    if bodies is None:
+        if seed is not None:
+            random.seed(seed)
+        bodies = create_bodies()
+    world = bodies[0].world
+    n = world.count
+    mass = world.mass[:n].copy()
+    static = world.static[:n].copy()
+    name = np.array([body.name for body in world.bodies])
+    row_of = {id(body): row for row, body in enumerate(world.bodies)}
+
+    frames = steps // every + 1
+    pos = np.full((frames, n, 2), np.nan)
+    vel = np.full((frames, n, 2), np.nan)
+    alive = np.zeros((frames, n), dtype=bool)
+    # Строки оставшихся тел; пересчитываются, только когда состав меняется
+    rows, version = None, None
+
+    for i in range(steps + 1):
+        if i:
+            world.step(dt, trails=False, integrator=integrator)
+        if i % every == 0:
+            if version != world.version:
+                rows = np.array([row_of[id(body)] for body in world.bodies], dtype=np.intp)
+                version = world.version
+            count = world.count
+            pos[i // every, rows] = world.pos[:count]
+            vel[i // every, rows] = world.vel[:count]
+            alive[i // every, rows] = True
+
+    return {
+        'step': np.arange(frames) * every,
+        'time': np.arange(frames) * every * dt,
+        'pos': pos,
+        'vel': vel,
+        'alive': alive,
+        'mass': mass,
+        'static': static,
+        'name': name,
+    }
+
+
+def save(result, path):
+    np.savez_compressed(path, **result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Симуляция без окна")
+    parser.add_argument('--steps', type=int, default=1000, help="число шагов")
+    parser.add_argument('--seed', type=int, default=None, help="зерно генератора")
+    parser.add_argument('--every', type=int, default=1, help="шаг записи траекторий")
+    parser.add_argument('--dt', type=float, default=1.0, help="шаг по времени")
+    parser.add_argument('--integrator', default=None, help="euler, leapfrog, yoshida4, rk4")
+    parser.add_argument('--scenario', default=None, help="файл сценария вместо случайной системы")
+    parser.add_argument('-o', '--output', default='trajectory.npz', help="файл .npz")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    bodies = create_scenario(args.scenario) if args.scenario else None
+    result = run(args.steps, seed=args.seed, every=args.every, bodies=bodies,
+                 dt=args.dt, integrator=args.integrator)
+    elapsed = time.perf_counter() - start
+    save(result, args.output)
+    print(f"{args.steps} шагов за {elapsed:.3f} с -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Сценарии: описание системы тел в файле INI.
+
+Раздел [body <id>] - одно тело:
+    x, y, vx, vy, mass, radius, color, name, static (по умолчанию yes)
+Разделы генераторов [ring <id>], [belt <id>], [cloud <id>] - count тел:
+    count, seed, color, name, static (по умолчанию no)
+    mass, size - масса и радиус тела: число или диапазон "a..b"
+    center - id тела [body], вокруг которого строится группа
+ring  - кольцо на круговых орбитах вокруг center:
+    radius, width, distribution = normal (width - ст. отклонение)
+    или uniform (width - полная ширина), retrograde
+belt  - пояс между inner и outer:
+    distribution = uniform (равномерно по площади) или normal,
+    spread - разброс скоростей в долях круговой, retrograde
+cloud - облако около center или точки x, y:
+    extent, distribution = normal (extent - ст. отклонение) или uniform
+    (круг радиуса extent), vx, vy - общая скорость, speed - разброс скоростей
+
+Генерация векторная, а разобранные файлы кэшируются, пока не изменятся;
+кэш избавляет от разбора и генерации, но объекты тел создаются заново.
+В программе станцией считается первое подвижное тело (без него сценарий
+не загружается), а центральным телом для панели - первое статичное,
+если оно есть.
+Пример: python main.py --scenario scenarios/debris.ini
+"""
+import configparser
+import os
+from functools import lru_cache
+import numpy as np
+from simulation.config import CONFIG as cfg, parse_color
+
+DEFAULT_COLOR = (120, 120, 120)
+
+
+def _value_range(section, key, default):
+    """Число или диапазон "a..b" как пара (a, b)"""
+    text = section.get(key, str(default))
+    low, _, high = text.partition('..')
+    return float(low), float(high or low)
+
+
+def _sample(rng, bounds, count):
+    low, high = bounds
+    if low == high:
+        return np.full(count, low)
+    return rng.uniform(low, high, count)
+
+
+def _circular(offsets, center_mass, retrograde):
+    """Скорости круговых орбит вокруг массы center_mass в начале координат"""
+    r = np.hypot(offsets[:, 0], offsets[:, 1])
+    speed = np.sqrt(cfg['G'] * center_mass / np.maximum(r, 1.0))
+    if retrograde:
+        speed = -speed
+    return np.column_stack((-offsets[:, 1], offsets[:, 0])) * (speed / np.maximum(r, 1e-12))[:, np.newaxis]
+
+
+def _polar(r, angle):
+    return np.column_stack((r * np.cos(angle), r * np.sin(angle)))
+
+
+def ring(section, rng, count, center_mass):
+    radius = section.getfloat('radius')
+    width = section.getfloat('width', 0.0)
+    if section.get('distribution', 'normal') == 'normal':
+        r = rng.normal(radius, width, count)
+    else:
+        r = rng.uniform(radius - width / 2, radius + width / 2, count)
+    offsets = _polar(np.abs(r), rng.uniform(0, 2 * np.pi, count))
+    return offsets, _circular(offsets, center_mass, section.getboolean('retrograde', False))
+
+
+def belt(section, rng, count, center_mass):
+    inner = section.getfloat('inner')
+    outer = section.getfloat('outer')
+    if section.get('distribution', 'uniform') == 'uniform':
+        r = np.sqrt(rng.uniform(inner * inner, outer * outer, count))
+    else:
+        r = np.clip(rng.normal((inner + outer) / 2, (outer - inner) / 4, count), inner, outer)
+    offsets = _polar(r, rng.uniform(0, 2 * np.pi, count))
+    vel = _circular(offsets, center_mass, section.getboolean('retrograde', False))
+    speed = np.hypot(vel[:, 0], vel[:, 1])[:, np.newaxis]
+    vel += rng.normal(0, 1, (count, 2)) * speed * section.getfloat('spread', 0.05)
+    return offsets, vel
+
+
+def cloud(section, rng, count, center_mass):
+    extent = section.getfloat('extent')
+    if section.get('distribution', 'normal') == 'normal':
+        offsets = rng.normal(0, extent, (count, 2))
+    else:
+        offsets = _polar(extent * np.sqrt(rng.uniform(0, 1, count)), rng.uniform(0, 2 * np.pi, count))
+    offsets += (section.getfloat('x', 0.0), section.getfloat('y', 0.0))
+    vel = rng.normal(0, section.getfloat('speed', 0.0), (count, 2))
+    vel += (section.getfloat('vx', 0.0), section.getfloat('vy', 0.0))
+    return offsets, vel
+
+
+GENERATORS = {
+    'ring': ring,
+    'belt': belt,
+    'cloud': cloud,
+}
+
+
+class Scenario:
+    """Разобранный сценарий: массивы начального состояния и группы тел.
+
+    groups - список (count, color, name, static) в порядке массивов.
+    Массивы только для чтения: объект общий для всех загрузок файла.
+    """
+
+    def __init__(self, pos, vel, mass, radius, static, groups):
+        for array in (pos, vel, mass, radius, static):
+            array.flags.writeable = False
+        self.pos = pos
+        self.vel = vel
+        self.mass = mass
+        self.radius = radius
+        self.static = static
+        self.groups = groups
+
+    def __len__(self):
+        return len(self.mass)
+
+    def create_bodies(self):
+        """Тела сценария в новом World"""
+        from simulation.celestial import CelestialBody
+        from simulation.physics import World
+        world = World(capacity=max(len(self), 16))
+        bodies = []
+        start = 0
+        for count, color, name, static in self.groups:
+            stop = start + count
+            bodies.extend(CelestialBody.many(
+                world, self.pos[start:stop], self.vel[start:stop], self.mass[start:stop],
+                self.radius[start:stop], color, name, is_static=self.static[start:stop]
+            ))
+            start = stop
+        return bodies
+
+
+def parse_scenario(path):
+    """Читает файл сценария и генерирует все группы тел"""
+    parser = configparser.ConfigParser()
+    if not parser.read(path, encoding='utf-8'):
+        raise FileNotFoundError(path)
+
+    bodies = {}
+    pos, vel, mass, radius, static, groups = [], [], [], [], [], []
+
+    def add(count, p, v, m, r, is_static, color, name):
+        pos.append(p)
+        vel.append(v)
+        mass.append(m)
+        radius.append(r)
+        static.append(np.full(count, is_static))
+        groups.append((count, color, name, is_static))
+
+    # Отдельные тела идут первыми: генераторы ссылаются на них через center
+    for title in parser.sections():
+        kind, _, ident = title.partition(' ')
+        if kind != 'body':
+            continue
+        section = parser[title]
+        body = (
+            np.array([[section.getfloat('x', 0.0), section.getfloat('y', 0.0)]]),
+            np.array([[section.getfloat('vx', 0.0), section.getfloat('vy', 0.0)]]),
+            section.getfloat('mass'),
+        )
+        bodies[ident] = body
+        add(1, body[0], body[1], np.array([body[2]]), np.array([section.getfloat('radius')]),
+            section.getboolean('static', True), parse_color(section.get('color', '200,200,200')),
+            section.get('name', ident))
+
+    for title in parser.sections():
+        kind, _, ident = title.partition(' ')
+        if kind == 'body':
+            continue
+        if kind not in GENERATORS:
+            raise ValueError(f"{path}: неизвестный раздел [{title}]")
+        section = parser[title]
+        count = section.getint('count')
+        rng = np.random.default_rng(section.getint('seed', 0))
+
+        center = section.get('center')
+        if center is not None:
+            if center not in bodies:
+                raise ValueError(f"{path}: [{title}] ссылается на неизвестное тело {center}")
+            center_pos, center_vel, center_mass = bodies[center]
+        elif kind == 'cloud':
+            center_pos, center_vel, center_mass = np.zeros((1, 2)), np.zeros((1, 2)), 0.0
+        else:
+            raise ValueError(f"{path}: [{title}] требует center")
+
+        offsets, v = GENERATORS[kind](section, rng, count, center_mass)
+        add(count, center_pos + offsets, center_vel + v,
+            _sample(rng, _value_range(section, 'mass', 0.01), count),
+            _sample(rng, _value_range(section, 'size', 1.0), count),
+            section.getboolean('static', False),
+            parse_color(section['color']) if 'color' in section else DEFAULT_COLOR,
+            section.get('name', ident))
+
+    if not groups:
+        raise ValueError(f"{path}: сценарий не содержит тел")
+    static = np.concatenate(static)
+    if static.all():
+        raise ValueError(f"{path}: сценарий не содержит подвижных тел (станции)")
+    return Scenario(np.concatenate(pos), np.concatenate(vel), np.concatenate(mass),
+                    np.concatenate(radius), static, groups)
+
+
+@lru_cache(maxsize=8)
+def _cached(path, mtime, size):
+    return parse_scenario(path)
+
+
+def read_scenario(path):
+    """Сценарий из кэша; файл перечитывается, только если он изменился"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return _cached(path, stat.st_mtime_ns, stat.st_size)
+
+
+def create_scenario(path):
+    """Тела сценария path в новом World"""
+    return read_scenario(path).create_bodies()
@@ -0,0 +1,369 @@
+"""Трансляция состояния модели наблюдателям (python main.py --serve).
+
+Протокол поверх TCP: сообщения с префиксом длины <I, первый байт
+сообщения - его тип.
+
+    KEYFRAME  <BIQI   номер кадра, шаг, число тел n; затем float32 pos (n, 2),
+                      vel (n, 2), mass (n), radius (n) и uint8 static (n)
+    DELTA     <BIQII  номер кадра, шаг, номер опорного кадра, число
+                      изменившихся тел k; затем uint32 индексы (k) и int16
+                      отклонения от опорного кадра pos (k, 2) и vel (k, 2) в
+                      единицах POS_QUANTUM и VEL_QUANTUM
+    IMPULSE   <Bd     от клиента: импульс станции в направлении (радианы)
+
+Отклонения берутся от опорного кадра, а не от предыдущего: ошибка
+округления не накапливается, а пропущенные кадры клиенту не нужны.
+Новый опорный кадр выпускается каждые [STREAM] keyframe_interval кадров,
+при смене состава тел и когда отклонение не помещается в int16.
+
+Сервер работает в своем потоке с циклом asyncio, кадры выпускаются с
+частотой [STREAM] rate. Медленный клиент не задерживает модель: для него
+хранится только последний неотправленный кадр, более ранние
+отбрасываются. Опорный кадр, который клиент пропустил, отправляется
+перед первым разностным кадром от него.
+
+Клиент без сети: StreamServer.connect_local и StreamClient.from_socket.
+Наблюдатель из командной строки: python -m simulation.stream [HOST:PORT]
+"""
+import argparse
+import asyncio
+import math
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+from simulation.config import CONFIG as cfg
+
+KEYFRAME, DELTA, IMPULSE = 1, 2, 3
+LENGTH = struct.Struct('<I')
+KEYFRAME_HEADER = struct.Struct('<BIQI')
+DELTA_HEADER = struct.Struct('<BIQII')
+IMPULSE_MESSAGE = struct.Struct('<Bd')
+# Шаг квантования отклонений: int16 покрывает +-512 единиц и +-8 единиц/шаг
+POS_QUANTUM = 1 / 64
+VEL_QUANTUM = 1 / 4096
+# Наибольшая длина сообщения от клиента
+MAX_CLIENT_MESSAGE = 64
+
+# Сообщение кадра и сообщение его опорного кадра (для опорного - то же)
+Frame = namedtuple('Frame', 'seq key_seq keyframe message')
+# Состояние, восстановленное клиентом
+StreamState = namedtuple('StreamState', 'seq step pos vel mass radius static')
+
+
+def pack_message(*parts):
+    """Сообщение с префиксом длины"""
+    payload = b''.join(parts)
+    return LENGTH.pack(len(payload)) + payload
+
+
+async def read_message(reader, max_size=None):
+    """Тело очередного сообщения или None, если соединение закрыто"""
+    try:
+        (size,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+        if max_size is not None and size > max_size:
+            raise ValueError(f"Сообщение длиной {size} байт больше допустимого")
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+class FrameEncoder:
+    """Кодирует состояния в опорные и разностные кадры"""
+
+    def __init__(self, keyframe_interval=None):
+        self.keyframe_interval = keyframe_interval or cfg['STREAM_KEYFRAME_INTERVAL']
+        self.seq = 0
+        # Опорный кадр: номер, массивы float32 в том виде, как их видит клиент, и сообщение
+        self.key = None
+
+    def encode(self, step, pos, vel, mass, radius, static):
+        """Frame для состояния; массивы pos, vel, mass, radius - float32"""
+        self.seq += 1
+        key = self.key
+        if (key is not None and self.seq - key['seq'] < self.keyframe_interval and
+                len(mass) == len(key['mass']) and np.array_equal(mass, key['mass']) and
+                np.array_equal(radius, key['radius']) and np.array_equal(static, key['static'])):
+            dpos = np.rint((pos - key['pos']) / POS_QUANTUM)
+            dvel = np.rint((vel - key['vel']) / VEL_QUANTUM)
+            if max(np.abs(dpos).max(initial=0), np.abs(dvel).max(initial=0)) <= 32767:
+                changed = np.flatnonzero((dpos != 0).any(axis=1) | (dvel != 0).any(axis=1))
+                message = pack_message(
+                    DELTA_HEADER.pack(DELTA, self.seq, step, key['seq'], len(changed)),
+                    changed.astype('<u4').tobytes(),
+                    dpos[changed].astype('<i2').tobytes(),
+                    dvel[changed].astype('<i2').tobytes())
+                return Frame(self.seq, key['seq'], key['message'], message)
+
+        message = pack_message(
+            KEYFRAME_HEADER.pack(KEYFRAME, self.seq, step, len(mass)),
+            pos.astype('<f4').tobytes(), vel.astype('<f4').tobytes(),
+            mass.astype('<f4').tobytes(), radius.astype('<f4').tobytes(),
+            static.astype(np.uint8).tobytes())
+        self.key = {'seq': self.seq, 'pos': pos, 'vel': vel, 'mass': mass,
+                    'radius': radius, 'static': static, 'message': message}
+        return Frame(self.seq, self.seq, message, message)
+
+
+class FrameDecoder:
+    """Восстанавливает состояние из кадров сервера"""
+
+    def __init__(self):
+        self.key = None
+
+    def decode(self, payload):
+        """StreamState или None, если опорный кадр для разностного неизвестен"""
+        kind = payload[0]
+        if kind == KEYFRAME:
+            _, seq, step, n = KEYFRAME_HEADER.unpack_from(payload)
+            offset = KEYFRAME_HEADER.size
+            arrays = []
+            for shape, dtype in (((n, 2), '<f4'), ((n, 2), '<f4'), (n, '<f4'), (n, '<f4'), (n, np.uint8)):
+                array = np.frombuffer(payload, dtype, np.prod(shape), offset).reshape(shape)
+                offset += array.nbytes
+                arrays.append(array)
+            pos, vel, mass, radius, static = arrays
+            self.key = StreamState(seq, step, pos.astype(float), vel.astype(float),
+                                   mass.astype(float), radius.astype(float), static.astype(bool))
+            return self.key
+        if kind == DELTA:
+            _, seq, step, key_seq, k = DELTA_HEADER.unpack_from(payload)
+            if self.key is None or self.key.seq != key_seq:
+                return None
+            offset = DELTA_HEADER.size
+            changed = np.frombuffer(payload, '<u4', k, offset)
+            dpos = np.frombuffer(payload, '<i2', 2 * k, offset + 4 * k).reshape(k, 2)
+            dvel = np.frombuffer(payload, '<i2', 2 * k, offset + 8 * k).reshape(k, 2)
+            pos = self.key.pos.copy()
+            vel = self.key.vel.copy()
+            pos[changed] += dpos * POS_QUANTUM
+            vel[changed] += dvel * VEL_QUANTUM
+            return self.key._replace(seq=seq, step=step, pos=pos, vel=vel)
+        raise ValueError(f"Неизвестный тип сообщения {kind}")
+
+
+class _Client:
+    """Подключенный наблюдатель: последний неотправленный кадр и счетчики"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = None
+        self.wake = asyncio.Event()
+        # Номер последнего отправленного клиенту опорного кадра
+        self.key_seq = None
+        self.sent = 0
+        self.dropped = 0
+
+
+class StreamServer(threading.Thread):
+    """Сервер трансляции в отдельном потоке.
+
+    publish и commands вызываются из цикла отрисовки каждый кадр: publish
+    лишь копирует массивы с нужной частотой, кодирование и отправка идут
+    в потоке сервера.
+    """
+
+    def __init__(self, host=None, port=None, rate=None, keyframe_interval=None):
+        super().__init__(name='stream', daemon=True)
+        self.host = host or cfg['STREAM_HOST']
+        self.port = cfg['STREAM_PORT'] if port is None else port
+        self.interval = 1 / (rate or cfg['STREAM_RATE'])
+        self.encoder = FrameEncoder(keyframe_interval)
+        self.impulses = queue.SimpleQueue()
+        self.clients = set()
+        # Адрес (host, port) после запуска; с портом 0 порт выбирает система
+        self.address = None
+        self.error = None
+        self._ready = threading.Event()
+        self._loop = None
+        self._stopping = None
+        self._tasks = set()
+        self._last = -math.inf
+
+    def start(self):
+        """Запускает поток и ждет, пока сервер начнет принимать подключения"""
+        super().start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    # Сторона отрисовки
+
+    def publish(self, world, step=None):
+        """Ставит состояние world в очередь трансляции, если подошло время кадра"""
+        now = time.perf_counter()
+        if self._loop is None or not self.clients or now - self._last < self.interval:
+            return
+        self._last = now
+        n = world.count
+        state = (world.steps if step is None else step,
+                 world.pos[:n].astype(np.float32), world.vel[:n].astype(np.float32),
+                 world.mass[:n].astype(np.float32), world.radius[:n].astype(np.float32),
+                 world.static[:n].copy())
+        self._loop.call_soon_threadsafe(self._broadcast, state)
+
+    def commands(self):
+        """Направления импульсов, пришедших от клиентов с прошлого вызова"""
+        directions = []
+        while True:
+            try:
+                directions.append(self.impulses.get_nowait())
+            except queue.Empty:
+                return directions
+
+    def connect_local(self):
+        """Сокет клиента, подключенного через socketpair, без сети"""
+        ours, theirs = socket.socketpair()
+        asyncio.run_coroutine_threadsafe(self._attach(ours), self._loop).result()
+        return theirs
+
+    def stop(self):
+        if self._loop is not None and self.is_alive():
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self.join()
+
+    # Поток сервера
+
+    def run(self):
+        try:
+            asyncio.run(self._main())
+        except Exception as error:
+            self.error = error
+            self._ready.set()
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._serve_client, self.host, self.port)
+        self.address = server.sockets[0].getsockname()[:2]
+        self._ready.set()
+        async with server:
+            await self._stopping.wait()
+            for client in list(self.clients):
+                client.writer.close()
+
+    async def _attach(self, sock):
+        reader, writer = await asyncio.open_connection(sock=sock)
+        task = asyncio.create_task(self._serve_client(reader, writer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _serve_client(self, reader, writer):
+        client = _Client(writer)
+        self.clients.add(client)
+        sender = asyncio.create_task(self._send(client))
+        try:
+            while True:
+                payload = await read_message(reader, MAX_CLIENT_MESSAGE)
+                if payload is None:
+                    break
+                if payload[0] == IMPULSE and len(payload) == IMPULSE_MESSAGE.size:
+                    _, direction = IMPULSE_MESSAGE.unpack(payload)
+                    if math.isfinite(direction):
+                        self.impulses.put(direction)
+        except (ConnectionError, ValueError):
+            # Оборванное соединение или чужой протокол: клиент отключается
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            writer.close()
+
+    async def _send(self, client):
+        writer = client.writer
+        try:
+            while True:
+                await client.wake.wait()
+                client.wake.clear()
+                frame, client.pending = client.pending, None
+                if frame.key_seq != client.key_seq:
+                    # Опорный кадр, от которого считан этот, клиент еще не получал
+                    writer.write(frame.keyframe)
+                    client.key_seq = frame.key_seq
+                if frame.message is not frame.keyframe:
+                    writer.write(frame.message)
+                client.sent += 1
+                await writer.drain()
+        except ConnectionError:
+            writer.close()
+
+    def _broadcast(self, state):
+        frame = self.encoder.encode(*state)
+        for client in self.clients:
+            if client.pending is not None:
+                client.dropped += 1
+            client.pending = frame
+            client.wake.set()
+
+
+class StreamClient:
+    """Наблюдатель: принимает состояния и отправляет импульсы"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.decoder = FrameDecoder()
+        # Принято байт и кадров по типам
+        self.received = 0
+        self.frames = {KEYFRAME: 0, DELTA: 0}
+
+    @classmethod
+    async def connect(cls, host, port):
+        return cls(*await asyncio.open_connection(host, port))
+
+    @classmethod
+    async def from_socket(cls, sock):
+        return cls(*await asyncio.open_connection(sock=sock))
+
+    async def receive(self):
+        """Следующее состояние или None, если сервер закрыл соединение"""
+        while True:
+            payload = await read_message(self.reader)
+            if payload is None:
+                return None
+            state = self.decoder.decode(payload)
+            self.received += LENGTH.size + len(payload)
+            self.frames[payload[0]] += 1
+            if state is not None:
+                return state
+
+    async def impulse(self, direction):
+        self.writer.write(pack_message(IMPULSE_MESSAGE.pack(IMPULSE, direction)))
+        await self.writer.drain()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def watch(host, port):
+    """Печатает сводку по каждому принятому кадру"""
+    client = await StreamClient.connect(host, port)
+    try:
+        while (state := await client.receive()) is not None:
+            print(f"кадр {state.seq:>6}  шаг {state.step:>8}  тел {len(state.mass):>6}  "
+                  f"принято {client.received:>10} байт")
+    finally:
+        await client.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Наблюдатель трансляции модели")
+    parser.add_argument('address', nargs='?', metavar='HOST:PORT',
+                        help="адрес сервера (по умолчанию [STREAM] в config.ini)")
+    args = parser.parse_args(argv)
+    host, port = cfg['STREAM_HOST'], cfg['STREAM_PORT']
+    if args.address:
+        host, _, port = args.address.rpartition(':')
+        host = host or cfg['STREAM_HOST']
+    try:
+        asyncio.run(watch(host, int(port)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
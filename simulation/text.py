@@ -0,0 +1,37 @@
+from functools import lru_cache
+import pygame
+
+# Максимальное число закэшированных отрисованных строк
+TEXT_CACHE_SIZE = 512
+
+
+@lru_cache(maxsize=None)
+def get_font(size, name=None):
+    """Шрифт из системного реестра; поиск выполняется один раз на (name, size)"""
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.SysFont(name, size)
+
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, size, color, name=None):
+    """Отрисованная строка; результат общий, изменять его нельзя"""
+    return get_font(size, name).render(text, True, color)
+
+
+@lru_cache(maxsize=64)
+def render_text_block(lines, size, color, line_height, align='left', name=None):
+    """Несколько строк, собранных в одну поверхность.
+
+    lines - кортеж строк; align - 'left' или 'right'.
+    """
+    rendered = [render_text(line, size, color, name) for line in lines]
+    width = max((text.get_width() for text in rendered), default=0)
+    height = line_height * (len(rendered) - 1) + max((text.get_height() for text in rendered), default=0)
+
+    block = pygame.Surface((width, max(height, 0)), pygame.SRCALPHA)
+    for i, text in enumerate(rendered):
+        x = width - text.get_width() if align == 'right' else 0
+        # BLEND_RGBA_MAX переносит пиксели строки на прозрачный фон без изменений
+        block.blit(text, (x, i * line_height), special_flags=pygame.BLEND_RGBA_MAX)
+    return block
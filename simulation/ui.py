@@ -1,25 +1,84 @@
 import pygame
 import math
+import numpy as np
 from simulation.config import CONFIG as cfg
+from simulation.celestial import draw_bodies
+from simulation.text import render_text, render_text_block
 from simulation.graphics import (  
     draw_gravity_grid,
     draw_dashed_line,
     draw_arrow,
     world_to_screen,
-    draw_compass
+    draw_compass,
+    draw_particles,
+    draw_path
 )
+from simulation.heatmap import draw_heatmap
+
+# Подписи режимов тепловой карты
+HEATMAP_NAMES = {None: 'ВЫКЛ', 'potential': 'потенциал', 'acceleration': 'ускорение'}
+
+def timeline_rect(width, height):
+    """Полоса прокрутки записи; справа внизу остается место для подсказок"""
+    return pygame.Rect(10, height - 24, max(50, width - 280), 10)
+
+def draw_timeline(surface, step, total):
+    width, height = surface.get_size()
+    bar = timeline_rect(width, height)
+    pygame.draw.rect(surface, cfg['GRID_COLOR'], bar)
+    filled = bar.copy()
+    filled.width = int(bar.width * step / max(1, total - 1))
+    pygame.draw.rect(surface, cfg['TRAIL_COLOR'], filled)
+    pygame.draw.rect(surface, cfg['TEXT_COLOR'], bar, 1)
+
+    label = render_text(f"Запись: шаг {step} / {total - 1}   ←/→, Home/End, ЛКМ", 20, cfg['TEXT_COLOR'])
+    surface.blit(label, (bar.x, bar.y - label.get_height() - 4))
+
+def draw_profiler(surface, profiler, x, y):
+    """Таблица времени фаз кадра: среднее, p95 и максимум в мс"""
+    stats = profiler.stats()
+    rows = [('фаза', 'сред', 'p95', 'макс')]
+    for name in profiler.PHASES + ('total',):
+        if name in stats:
+            rows.append((name,) + tuple(f"{value:.2f}" for value in stats[name]))
+
+    # Столбцы выравниваются по позициям: шрифт может быть непропорциональным
+    name_width, column_width, line_height = 80, 50, 18
+    panel = pygame.Surface((name_width + 3 * column_width + 12, len(rows) * line_height + 8),
+                           pygame.SRCALPHA)
+    panel.fill((0, 0, 0, 160))
+    surface.blit(panel, (x, y))
+    for i, row in enumerate(rows):
+        row_y = y + 4 + i * line_height
+        surface.blit(render_text(row[0], 18, cfg['TEXT_COLOR']), (x + 6, row_y))
+        for j, cell in enumerate(row[1:]):
+            text_surface = render_text(cell, 18, cfg['TEXT_COLOR'])
+            right = x + 6 + name_width + (j + 1) * column_width
+            surface.blit(text_surface, (right - text_surface.get_width(), row_y))
 
 def draw_ui(surface, station, earth, scale, show_vectors, show_grid, 
             show_info, camera_x, camera_y, current_width, current_height,
-            bodies, thrust_particles, thrust_active, thrust_direction):
+            bodies, thrust_particles, thrust_active, thrust_direction, time_warp=1,
+            profiler=None, prediction=None, ghost=None, heatmap=None):
     
-    # Рисование сетки
+    # Тепловая карта поля и сетка
+    if heatmap is not None:
+        draw_heatmap(surface, bodies, heatmap, camera_x, camera_y, scale)
     if show_grid:
         draw_gravity_grid(surface, bodies, camera_x, camera_y, scale)
+    if profiler is not None:
+        profiler.mark('grid')
     
     # Рисование тел
-    for body in bodies:
-        body.draw(surface, camera_x, camera_y, scale)
+    draw_bodies(surface, bodies, camera_x, camera_y, scale)
+    if profiler is not None:
+        profiler.mark('bodies')
+    
+    # Прогноз траектории и путь после импульса к курсору
+    for points, color in ((prediction, cfg['PREDICTION_COLOR']), (ghost, cfg['GHOST_COLOR'])):
+        if points is not None and len(points):
+            draw_path(surface, color, np.vstack(((station.x, station.y), points)),
+                      camera_x, camera_y, scale)
     
     # Векторы сил
     if show_vectors:
@@ -46,16 +105,7 @@ def draw_ui(surface, station, earth, scale, show_vectors, show_grid,
             draw_arrow(surface, body.color, end_screen, direction_vector, size=12)
     
     # Частицы двигателя
-    for p in thrust_particles:
-        screen_x, screen_y = world_to_screen(p['x'], p['y'], camera_x, camera_y, scale, 
-                                           current_width, current_height)
-        alpha = min(255, p['life'] * 25)
-        particle_surf = pygame.Surface((p['size']*2, p['size']*2), pygame.SRCALPHA)
-        pygame.draw.circle(particle_surf, 
-                         (*cfg['THRUST_PARTICLE_COLOR'], alpha), 
-                         (p['size'], p['size']), 
-                         p['size'])
-        surface.blit(particle_surf, (screen_x - p['size'], screen_y - p['size']))
+    draw_particles(surface, thrust_particles, camera_x, camera_y, scale)
     
     # Пламя двигателя
     if thrust_active:
@@ -90,55 +140,67 @@ def draw_ui(surface, station, earth, scale, show_vectors, show_grid,
         ]
         
         pygame.draw.aalines(surface, cfg['THRUST_COLOR'], True, flame_points)
+    if profiler is not None:
+        profiler.mark('effects')
     
     # Информационная панель
     if show_info:
-        earth_dist = math.sqrt((station.x - earth.x)**2 + (station.y - earth.y)**2)
         speed = math.sqrt(station.vx**2 + station.vy**2)
         
-        small_font = pygame.font.SysFont(None, 20)
-        medium_font = pygame.font.SysFont(None, 24)
-        
         # Основные параметры
-        texts_main = [
-            f"Скорость: {speed:.2f}",
-            f"Расст. до Земли: {earth_dist:.1f}",
-            f"Масштаб: {scale:.2f}x"
+        texts_main = [f"Скорость: {speed:.2f}"]
+        if earth is not None:
+            # В сценарии может не быть статичных тел
+            earth_dist = math.sqrt((station.x - earth.x)**2 + (station.y - earth.y)**2)
+            texts_main.append(f"Расст. до Земли: {earth_dist:.1f}")
+        texts_main += [
+            f"Масштаб: {scale:.2f}x",
+            f"Ускорение времени: {time_warp}x"
         ]
         
         for i, text in enumerate(texts_main):
-            text_surface = medium_font.render(text, True, cfg['TEXT_COLOR'])
+            text_surface = render_text(text, 24, cfg['TEXT_COLOR'])
             surface.blit(text_surface, (10, 10 + i * 25))
         
         # Управление
-        texts_controls = [
+        texts_controls = (
             "Пробел: Пауза/Пуск",
             "R: Новая система",
             "C: Очистить след",
             f"V: Векторы сил: {'ВКЛ' if show_vectors else 'ВЫКЛ'}",
             f"G: Сетка: {'ВКЛ' if show_grid else 'ВЫКЛ'}",
+            f"H: Карта поля: {HEATMAP_NAMES[heatmap]}",
             "F: Случайный импульс",
             "ЛКМ: Импульс к курсору",
             "ПКМ: Перемещение камеры",
             "Колесо: Масштаб",
+            "[ ]: Ускорение времени",
             "0: Сброс камеры",
+            "F5/F9: Сохранить/загрузить",
+            "P: Профайлер",
+            "T: Прогноз траектории",
             "I: Скрыть/показать инфо",
             "F11: Полный экран"
-        ]
+        )
         
-        for i, text in enumerate(texts_controls):
-            text_surface = small_font.render(text, True, (180, 200, 230))
-            surface.blit(text_surface, 
-                        (current_width - text_surface.get_width() - 10, 
-                         current_height - (len(texts_controls) * 20) + i * 20))
+        # Блок собирается в одну поверхность и кэшируется целиком
+        controls = render_text_block(texts_controls, 20, (180, 200, 230), 20, align='right')
+        surface.blit(controls, 
+                    (current_width - controls.get_width() - 10, 
+                     current_height - (len(texts_controls) * 20)))
         
         # Компас
         compass_x = current_width - 60
         compass_y = 60
         draw_compass(surface, station.vx, station.vy, compass_x, compass_y)
-        compass_label = small_font.render("Направление", True, cfg['TEXT_COLOR'])
+        compass_label = render_text("Направление", 20, cfg['TEXT_COLOR'])
         surface.blit(compass_label, (compass_x - compass_label.get_width()//2, compass_y + 50))
     else:
-        small_font = pygame.font.SysFont(None, 20)
-        info_hint = small_font.render("Нажмите I для отображения информации", True, (150, 170, 200))
+        info_hint = render_text("Нажмите I для отображения информации", 20, (150, 170, 200))
         surface.blit(info_hint, (current_width - info_hint.get_width() - 10, 10))
+    
+    # Время фаз кадра
+    if profiler is not None:
+        if profiler.show:
+            draw_profiler(surface, profiler, 10, 120 if show_info else 10)
+        profiler.mark('hud')
@@ -0,0 +1,251 @@
+"""Расчет физики в фоновом потоке (python main.py --threaded).
+
+Поток физики владеет своим World и после шагов публикует снимок -
+копию World с телами-представлениями. Снимков два: один показывает
+отрисовка, в другой поток пишет следующий. Передача идет без
+блокировок: отрисовка берет текущий снимок методом acquire и отмечает
+его поколение, а поток пишет во второй буфер, только когда отрисовка
+уже взяла последний опубликованный снимок и, значит, отпустила
+предыдущий. Пока снимок опубликован, он не меняется.
+
+Все изменения состояния (импульс, новая система, пауза, ускорение
+времени) передаются через очередь команд и выполняются в потоке
+физики между шагами.
+"""
+import copy
+import queue
+import threading
+import time
+import numpy as np
+from simulation.celestial import CelestialBody
+from simulation.checkpoint import save_checkpoint
+from simulation.physics import World
+
+# Наибольшее ожидание команд между проверками, секунд
+IDLE_WAIT = 0.05
+# Шаги выполняются порциями примерно такой длительности, секунд: между
+# ними поток принимает команды и публикует снимки
+CHUNK_SECONDS = 1 / 120
+
+
+class Snapshot(World):
+    """Опубликованная копия World; отрисовка только читает ее.
+
+    earth и station - представления центрального тела и станции,
+    alpha - доля шага для интерполяции на момент публикации.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.generation = -1
+        self.alpha = 1.0
+        self.earth = None
+        self.station = None
+
+    def capture(self, world, station, alpha):
+        """Копирует состояние world; представления тел - только при смене состава"""
+        if self.copy_from(world):
+            bodies = [CelestialBody.__new__(CelestialBody) for _ in range(world.count)]
+            for index, (body, source) in enumerate(zip(bodies, world.bodies)):
+                body.world = self
+                body.index = index
+                body.name = source.name
+            self.bodies = bodies
+        static = self.static[:self.count]
+        self.earth = self.bodies[int(np.argmax(static))] if static.any() else None
+        self.station = self.bodies[station.index]
+        self.alpha = alpha
+
+
+class PhysicsWorker(threading.Thread):
+    """Поток, продвигающий систему bodies по шагам stepper.
+
+    Если станция погибла, поток останавливается на последнем снимке с
+    ней и выставляет station_lost, пока не будет вызван reset.
+    """
+
+    def __init__(self, bodies, stepper):
+        super().__init__(name='physics', daemon=True)
+        self.stepper = stepper
+        self.commands = queue.Queue()
+        self.paused = True
+        self.running = True
+        self.lost = False
+        # Число запрошенных и выполненных команд reset
+        self.requested = 0
+        self.resets = 0
+        self.error = None
+        self._replace(bodies)
+
+        self.generation = 0
+        self.front = Snapshot()
+        self.back = Snapshot()
+        self.front.capture(self.world, self.station, 1.0)
+        self.front.generation = self.generation
+        self.consumed = -1
+        self.dirty = False
+        # Накопившиеся, но еще не выполненные шаги
+        self.owed = 0
+
+    def _replace(self, bodies):
+        self.world = bodies[0].world
+        self.station = next(body for body in bodies if not body.is_static)
+        self.lost = False
+
+    @property
+    def station_lost(self):
+        """Станция погибла, а новая система еще не запрошена"""
+        return self.lost and self.requested == self.resets
+
+    # Сторона отрисовки
+
+    def acquire(self):
+        """Последний опубликованный снимок; предыдущий после этого отпускается"""
+        if self.error is not None:
+            raise RuntimeError("Поток физики завершился с ошибкой") from self.error
+        snapshot = self.front
+        self.consumed = snapshot.generation
+        return snapshot
+
+    def impulse(self, direction):
+        self.commands.put((self._impulse, (direction,)))
+
+    def clear_trail(self):
+        self.commands.put((self._clear_trail, ()))
+
+    def pause(self, paused):
+        self.commands.put((self._pause, (paused,)))
+
+    def reset(self, bodies, accumulator=0.0):
+        """Заменяет систему на bodies (новый World, переданный потоку)"""
+        self.requested += 1
+        self.commands.put((self._reset, (bodies, accumulator)))
+
+    def save(self, path, particles, state):
+        """Снимок системы в path (simulation.checkpoint); ждет окончания записи.
+
+        Снимок делается в потоке физики между шагами: у копии для
+        отрисовки нет памяти интегратора. accumulator и warp_index в state
+        берутся из stepper в момент записи.
+        """
+        done = threading.Event()
+        self.commands.put((self._save, (path, copy.deepcopy(particles), dict(state), done)))
+        while not done.wait(IDLE_WAIT) and self.is_alive():
+            pass
+
+    def call(self, func, *args):
+        """Выполняет func(*args) в потоке физики, например stepper.faster"""
+        self.commands.put((func, args))
+
+    def stop(self):
+        self.commands.put((self._stop, ()))
+        self.join()
+        if self.world.recorder is not None:
+            self.world.recorder.close()
+            self.world.recorder = None
+
+    # Команды, выполняемые в потоке физики
+
+    def _impulse(self, direction):
+        if not self.lost:
+            self.station.apply_impulse(direction)
+
+    def _clear_trail(self):
+        if not self.lost:
+            self.station.clear_trail()
+
+    def _save(self, path, particles, state, done):
+        try:
+            state.update(accumulator=self.stepper.accumulator, warp_index=self.stepper.warp_index)
+            save_checkpoint(path, self.world, particles, state)
+        finally:
+            done.set()
+
+    def _pause(self, paused):
+        self.paused = paused
+        self.owed = 0
+
+    def _reset(self, bodies, accumulator):
+        # Запись относится к прежней системе и на этом завершается
+        if self.world.recorder is not None:
+            self.world.recorder.close()
+            self.world.recorder = None
+        self._replace(bodies)
+        self.stepper.accumulator = accumulator
+        self.owed = 0
+        self.resets += 1
+
+    def _stop(self):
+        self.running = False
+
+    # Поток физики
+
+    def run(self):
+        try:
+            self._loop()
+        except Exception as error:
+            self.error = error
+
+    def _loop(self):
+        last = time.perf_counter()
+        wait = 0.0
+        while self.running:
+            # Ожидание следующего шага прерывается пришедшей командой
+            try:
+                func, args = self.commands.get(timeout=wait) if wait > 0 else self.commands.get_nowait()
+                func(*args)
+                self.dirty = True
+                while True:
+                    func, args = self.commands.get_nowait()
+                    func(*args)
+            except queue.Empty:
+                pass
+
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            stepper = self.stepper
+            if not self.paused and not self.lost:
+                self.owed = min(self.owed + stepper.take_steps(elapsed), stepper.max_steps)
+                if self.owed:
+                    self._step()
+                self.lost = not self.station.alive
+
+            if self.dirty and not self.lost:
+                self._publish()
+
+            if self.paused or self.lost:
+                wait = IDLE_WAIT
+            elif self.owed:
+                wait = 0.0
+            else:
+                # Время до следующего шага при текущем ускорении
+                remaining = (stepper.dt - stepper.accumulator) / (stepper.rate * stepper.warp * stepper.dt)
+                wait = min(max(remaining, 0.0), IDLE_WAIT)
+            if self.dirty:
+                # Отрисовка еще не взяла прошлый снимок: повторить публикацию скоро
+                wait = min(wait, 1 / 240)
+
+    def _step(self):
+        """Выполняет порцию накопившихся шагов"""
+        stepper = self.stepper
+        steps = 1
+        if stepper.step_seconds > 0:
+            steps = max(1, min(self.owed, int(CHUNK_SECONDS / stepper.step_seconds)))
+        start = time.perf_counter()
+        self.world.advance(steps, stepper.dt)
+        stepper.step_seconds = (time.perf_counter() - start) / steps
+        self.owed -= steps
+        self.dirty = True
+
+    def _publish(self):
+        if self.consumed != self.front.generation:
+            return
+        # Отрисовка держит front, back свободен
+        snapshot = self.back
+        alpha = 1.0 if self.paused or self.owed else self.stepper.alpha
+        snapshot.capture(self.world, self.station, alpha)
+        self.generation += 1
+        snapshot.generation = self.generation
+        self.back = self.front
+        self.front = snapshot
+        self.dirty = False